@@ -10,7 +10,7 @@ import numpy as np
 
 def do_csv_stat(fname=None,**kwargs):
     """
-        Reads a csv into a dataframe to perform the analysis
+        Reads a csv (or parquet, feather, npy, npz) file into a dataframe to perform the analysis
         cf do_dataframe_stats
     """
 
@@ -18,13 +18,40 @@ def do_csv_stat(fname=None,**kwargs):
         raise ValueError("Incorrect input : please provide filename")
 
     try:
-        df = pd.read_csv(fname, index_col=0)
+        df = read_dataframe(fname)
     except:
         raise ValueError("Enable to open file %s" %fname)
 
     return do_dataframe_stats(dataframe=df, **kwargs)
 
 
+def read_dataframe(fname):
+    """
+        Reads a file into a dataframe, according to its extension
+        .npy arrays are memory-mapped, and their columns are named "0", "1", ...
+        from .npz files, the array "data" (or the first array) is read, with column names from the array "labels" if any
+    """
+    if fname.endswith('.parquet'):
+        return pd.read_parquet(fname)
+    elif fname.endswith('.feather'):
+        return pd.read_feather(fname)
+    elif fname.endswith('.npy'):
+        data = np.load(fname, mmap_mode='r')
+        labels = None
+    elif fname.endswith('.npz'):
+        with np.load(fname) as arrays:
+            names = [name for name in arrays.files if name != 'labels']
+            data = arrays['data' if 'data' in names else names[0]]
+            labels = [str(label) for label in arrays['labels']] if 'labels' in arrays.files else None
+    else:
+        return pd.read_csv(fname, index_col=0)
+    if data.ndim == 1:
+        data = data.reshape((data.shape[0], 1))
+    if labels is None:
+        labels = [str(i) for i in range(data.shape[1])]
+    return pd.DataFrame(data, columns=labels, copy=False)
+
+
 def identity(x):
     return x
 
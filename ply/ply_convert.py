@@ -58,6 +58,8 @@ __VERSION__ = "0.0.4"
         include=         : string that *must* be included in file name (support multiple)
         exclude=         : string that *must not* be included in file name (support multiple)
         -recursive       : searches recursively for files  
+        workers=         : number of threads listing folders concurrently (useful on network file systems)
+        -sorted          : processes files in sorted order
 
 # EXAMPLES :
 
@@ -96,13 +98,20 @@ try:
     from numpy import *
     from plyfile import PlyData, PlyElement
     import sys
-    from os import listdir,path
-    from sklearn.decomposition import PCA
+    from os import path
     from collections.abc import Iterable
     import sio_tools as sio
 except:
     raise ValueError('Necessary Python modules could not be loaded')
 
+# sklearn is slow to import and only needed to align meshes
+def PCA(*args,**kwargs):
+    try:
+        from sklearn.decomposition import PCA as sklearn_PCA
+    except:
+        raise ValueError('Module sklearn is needed to align meshes')
+    return sklearn_PCA(*args,**kwargs)
+
 ## Version
 def version():
     return __VERSION__
@@ -664,6 +673,8 @@ def do_batch_conversion(args,files=[]):
     includes=[]
     excludes=[]
     pathes=[]
+    workers=1
+    do_sort=False
 
     for arg in args:
         if arg.startswith('out='):
@@ -680,6 +691,10 @@ def do_batch_conversion(args,files=[]):
             includes.append(arg[8:])
         elif arg.startswith('exclude='):
             excludes.append(arg[8:])
+        elif arg.startswith('workers='):
+            workers=int(arg[8:])
+        elif arg.startswith('-sorted'):
+            do_sort=True
         if arg.startswith('path='):
             pathes.append(arg[5:])
 
@@ -704,14 +719,12 @@ def do_batch_conversion(args,files=[]):
             # Do we have a path ? If not, path is here.s
             if len(pathes)==0:
                 pathes=['.']
-            for pathe in pathes:
-                # Now listing all files in path that match a batch suffix
-                for fname in listdir(pathe):
-                    if len(fname) > 4:
-                        if fname[-4:] in batches:
-                            files.append(path.join(pathe,fname))
+            # Now listing all files in path that match a batch suffix
+            files.extend(sio.make_recursive_file_list(folders=pathes, ext=batches, max_depth=0,
+                                                      workers=workers, sort=do_sort))
         else:
-            files = sio.make_recursive_file_list(include=includes, exlude=excludes, folders=pathes, ext=batches )
+            files = sio.make_recursive_file_list(include=includes, exclude=excludes, folders=pathes, ext=batches,
+                                                 workers=workers, sort=do_sort)
 
     for file in files:
         if len(sout)==0:
@@ -6,30 +6,16 @@ Grapher is a sub-module defining the class Graph.
 
 from numpy import *
 import sys
+import re
 import sio_tools as sio
-import pandas as pd
 import numpy as np
 
 from seplot.styler import Style
-import seplot.kw_dictionaries as kd
 import seplot.style_dictionaries as sd
 from collections.abc import Iterable
+from functools import lru_cache
 
-
-# Basic set of colours, symbols, and lines
-csl=sd.get_colors_symbols_lines()
-colours=csl['colours']
-colour_strings=csl['colour_strings']
-symbols=csl['symbols']
-linests=csl['linests']
-# dictionaries
-dicos=sd.get_dictionaries()
-col_dict=dicos['colors']
-linst_dict=dicos['lines']
-symst_dict=dicos['symbols']
-linw_dict=dicos['widths']
-grad_dict=dicos['gradients']
-kw_dict=kd.get_keywords()
+# Dictionaries of colours, symbols and lines are made on first use (cf style_dictionaries)
 
 
 class Graph:
@@ -41,7 +27,8 @@ class Graph:
                 cond=[],range=[],
                 function_string='',legend='',
                 fname=None,data=None,numr=0,mode='v',
-                n_points='200',
+                n_points='200',frame=None,
+                bins2d=None,xlog=0,ylog=0,
                 **kwargs):
         """ Instance initialization """
 
@@ -49,6 +36,7 @@ class Graph:
             stil = ''
 
         self.fname = fname
+        self.frame = None if frame is None else int(frame)
         self.function_string = function_string
         self.numr = numr
         self.mode = mode
@@ -62,6 +50,8 @@ class Graph:
         self.is_function = 0
         self.is_histogram = 0
         self.make_histogram = 0
+        self.is_density = 0
+        self.density_columns = {}
         self.xlabel = None
         self.ylabel = None
 
@@ -76,6 +66,7 @@ class Graph:
         self.make_auto_legend(legend)
 
         in_data = { "data" : np.array([[None]]) , "size_x" : 1 , "size_y" : 1 , "labels": [None] }
+        columns = None
 
         # Trying to figure out the input
         if self.function_string:
@@ -98,13 +89,43 @@ class Graph:
                         labels = [None]*s[1]
                     in_data = { "data" : data, "size_x" : s[0] , "size_y" : s[1] , "labels": labels }
 
-                if isinstance(data, pd.DataFrame):
+                # pandas is not imported unless needed : a dataframe can only come from an already imported pandas
+                if 'pandas' in sys.modules and isinstance(data, sys.modules['pandas'].DataFrame):
                     in_data = sio.import_array_from_frames(data)
 
             else:
                 if self.fname is not None:
-                    # We have a filename
-                    in_data = sio.data_import_wrapper(self.fname)
+                    # We have a filename : we only read the columns needed by the expressions
+                    make_histogram = len([arg for arg in args if arg.startswith('-hist')]) > 0
+                    usecols = None
+                    if self.mode == 'v':
+                        if not make_histogram:
+                            usecols = make_column_selector([x if x is not None else '__0__',
+                                                            y if y is not None else '__1__',
+                                                            dx, dy, siz, col, cond])
+                        elif y is not None:
+                            usecols = make_column_selector([y, cond])
+                    in_data = self.import_file(usecols=usecols)
+                    columns = in_data.get('columns', None)
+                    if columns is not None:
+                        if in_data['size_x'] == 1:
+                            # a single row is plotted horizontally, using all columns
+                            in_data = self.import_file()
+                            columns = None
+                        else:
+                            # the file has several rows and columns : x and y are the first two columns by default
+                            if not make_histogram:
+                                if x is None:
+                                    x = '__0__'
+                                if y is None:
+                                    y = '__1__'
+                                x = remap_columns(x, columns)
+                            y = remap_columns(y, columns)
+                            dx = remap_columns(dx, columns)
+                            dy = remap_columns(dy, columns)
+                            siz = remap_columns(siz, columns)
+                            col = remap_columns(col, columns)
+                            cond = remap_columns(cond, columns)
                 else:
                     # Maybe we just got x (and/or y) as a list / array / ...
                     if isinstance(x, Iterable) and not type(x)==str:
@@ -137,8 +158,8 @@ class Graph:
             except:
                 raise ValueError("Error : no suitable data, nor function given")
 
-            # Dirty tricks for maximum compatibility
-            if min(in_data['size_x'],in_data['size_y'])==1:
+            # Dirty tricks for maximum compatibility (not for files of which only some columns were read)
+            if columns is None and (in_data['size_x']==1 or in_data['size_y']==1):
                 if x is None:
                     x='auto'
                     sio.custom_warn("Single data row/column : x is automatic")
@@ -177,6 +198,10 @@ class Graph:
                     stil='B'
                 elif not (stil=='b' or stil=='B'):
                     sio.custom_warn('Forcing style to histogram')
+            elif arg.startswith('-density'):
+                self.is_density=1
+        if bins2d is not None:
+            self.is_density=1
 
 
         if not self.is_function:
@@ -191,40 +216,39 @@ class Graph:
                     A=self.set_A_range(A,range)
                 # Set X Y to start with
                 self.set_init_XY(A)
-                # We perform a first extraction of X and Y to be able to evaluate conditions on X,Y
+                # Each expression is evaluated once, on all rows : conditions can then be evaluated on X,Y
                 self.X=self.set_from_input(A,x,'x')
                 self.Y=self.set_from_input(A,y,'y')
                 self.dX=self.set_from_input(A,dx,'dx')
                 self.dY=self.set_from_input(A,dy,'dy')
-
-                #if (len(self.range) or len(cond)):
-                if len(cond):
-                    A=self.set_A_condition(A,cond)
-                # Set X Y to start with... Is that really usefull ?
-                self.set_init_XY(A)
-                # Now we perform the definitive extraction of X,Y once A has been filtered
-                self.X=self.set_from_input(A,x,'x')
-                self.Y=self.set_from_input(A,y,'y')
-                self.dX=self.set_from_input(A,dx,'dx')
-                self.dY=self.set_from_input(A,dy,'dy')
-
                 # Now we assign colors and size if need be
                 self.S=self.set_from_input(A,siz,'size')
                 self.C=self.set_from_input(A,col,'color')
+
+                # The condition selects rows of the computed values
+                if len(cond):
+                    kept=self.condition_mask(A,cond)
+                    self.X=self.select_rows(self.X,x,kept)
+                    self.Y=self.select_rows(self.Y,y,kept)
+                    self.dX=self.select_rows(self.dX,dx,kept)
+                    self.dY=self.select_rows(self.dY,dy,kept)
+                    self.S=self.select_rows(self.S,siz,kept)
+                    self.C=self.select_rows(self.C,col,kept)
+
                 if len(self.C):
                     if not var(self.C)<sys.float_info.epsilon:
                         self.color_from_data=True
                     else:
                         sio.custom_warn("No variance in color provided, using random color based on mean value !")
-                        col=colour_strings[int(mean(self.C)) %7]
+                        col=sd.get_colors_symbols_lines()['colour_strings'][int(mean(self.C)) %7]
                         self.C=[]
 
             else:
                 # We're making a histogram !
                 self.X=self.set_from_input(A,y,'y')
+                self.Y=self.X
                 if len(cond):
-                    A=self.set_A_condition(A,cond)
-                self.Y=self.set_from_input(A,y,'y')
+                    self.Y=self.select_rows(self.Y,y,self.condition_mask(A,cond))
                 if x is None:
                     x=0
 
@@ -287,6 +311,13 @@ class Graph:
             if min(self.S) <= 0:
                 self.S = (self.S-min(self.S)) + 0.001
 
+            if self.is_density:
+                if self.make_histogram:
+                    raise ValueError('Cannot make both a histogram and a density plot')
+                self.make_density(bins2d,xlog=xlog,ylog=ylog)
+                # a bitmap cannot be placed on logarithmic axes
+                kwargs['density']='cells' if (xlog or ylog) else 'bitmap'
+
         # and now we can make the style !
         kwargs['col']=col ; kwargs['siz']=siz ; kwargs['is_function']=self.is_function
         kwargs['numr']=self.numr ; kwargs['dx']=dx ; kwargs['dy']=dy ; kwargs['stil']=stil
@@ -295,10 +326,111 @@ class Graph:
         style=Style(*args, **kwargs)
         self.style = style.style
         self.stroke_style = style.stroke_style
+        self.style_columns = style.columns
+        self.style_kind = style.goodstyle.kind
 
         if style.goodstyle.kind == 'histogram':
             self.is_histogram = 1
 
+    def decimate(self,method,xmin,xmax,pixels,xlog=0,ylog=0):
+        """
+        Reduces a line plot to a polyline that looks the same on a figure of pixels columns between xmin and xmax
+        method is 'minmax' (first, min, max and last point of each pixel column) or 'lttb' (cf decimate_lttb)
+        Only lines of increasing x, without errors, size or color from data, are decimated
+        returns the number of points before and after decimation
+        """
+        n=len(self.X)
+        if self.is_function or self.is_histogram or not self.style_kind=='line' or not self.style_columns==['x','y']:
+            return n,n
+        if n<=2*pixels or not len(self.Y)==n:
+            return n,n
+        X=asarray(self.X,dtype=float)
+        Y=asarray(self.Y,dtype=float)
+        if not (diff(X)>=0).all():
+            return n,n
+        # Positions in the axis coordinates, where pixel columns have the same width
+        if xlog:
+            X=log10(X)
+            xmin,xmax=log10(xmin),log10(xmax)
+        width=(xmax-xmin)/pixels
+        if not width>0:
+            return n,n
+        if method=='lttb':
+            if ylog:
+                Y=log10(Y)
+            kept=decimate_lttb(X,Y,2*int(ceil((X[-1]-X[0])/width))+2)
+        elif method=='minmax':
+            kept=decimate_minmax(Y,floor((X-xmin)/width).astype(int64))
+        else:
+            raise ValueError('Unknown decimation %s (use minmax or lttb)' % method)
+
+        for name in ['X','Y','dX','dY','S','C']:
+            values=getattr(self,name)
+            if isinstance(values,ndarray) and values.ndim and len(values)==n:
+                setattr(self,name,values[kept])
+        return n,len(kept)
+
+    def make_density(self,bins=None,xlog=0,ylog=0):
+        """
+        Bins X and Y into a 2D histogram of bins cells (a number, or numbers along x and y, e.g. '200,100')
+        Cells are regular along each axis, in logarithmic scale for a logarithmic axis
+        X, Y and C become the centers and the counts of the cells (scaled from 0 to 1, nan for empty cells),
+            and the limits of non-empty cells are kept in density_columns
+        """
+        if bins is None:
+            bins=[100,100]
+        else:
+            try:
+                bins=[int(b) for b in str(bins).split(',')]
+            except:
+                raise ValueError('Could not understand bins2d from %s (e.g. bins2d=100 or bins2d=200,100)' %bins)
+            if len(bins)==1:
+                bins=bins*2
+        X=ravel(asarray(self.X,dtype=float))
+        Y=ravel(asarray(self.Y,dtype=float))
+        kept=isfinite(X)&isfinite(Y)
+        if xlog:
+            kept&=X>0
+        if ylog:
+            kept&=Y>0
+        X=X[kept]
+        Y=Y[kept]
+        if not len(X):
+            raise ValueError('No finite data to make a density plot')
+        xedges=histogram_edges(X,bins[0],xlog)
+        yedges=histogram_edges(Y,bins[1],ylog)
+        (counts,xedges,yedges)=histogram2d(X,Y,bins=[xedges,yedges])
+        counts=ravel(counts/counts.max())
+        counts[counts==0]=nan
+
+        # cells ordered as the counts : x index first
+        nx=len(xedges)-1
+        ny=len(yedges)-1
+        self.X=repeat(histogram_centers(xedges,xlog),ny)
+        self.Y=tile(histogram_centers(yedges,ylog),nx)
+        self.C=counts
+        full=isfinite(counts)
+        self.density_columns={'xmin':repeat(xedges[:-1],ny)[full],'xmax':repeat(xedges[1:],ny)[full],
+                              'ymin':tile(yedges[:-1],nx)[full],'ymax':tile(yedges[1:],nx)[full],
+                              'color':counts[full]}
+        self.dX=zeros(len(self.X))
+        self.dY=self.dX
+        self.S=self.C
+
+    def plot_columns(self):
+        """ The data columns used by the style, as arrays (views of X, Y, etc. when possible) """
+        values={'x':self.X,'y':self.Y,'dx':self.dX,'dy':self.dY,'size':self.S,'color':self.C}
+        if 'xmin' in self.style_columns:
+            # density plot drawn as cells : only non-empty cells are drawn
+            values=self.density_columns
+        return dict([(name,ravel(values[name])) for name in self.style_columns])
+
+    def import_file(self,usecols=None):
+        """ Imports data from the file, or only from a frame of the file if a frame was chosen """
+        if self.frame is None:
+            return sio.data_import_wrapper(self.fname, keep_lines=False, usecols=usecols)
+        return sio.FrameIndex(self.fname).read_frame(self.frame, usecols=usecols)
+
     def make_auto_legend(self,legend):
         """ A function to automatically make a legend """
         if legend=='None' or legend=='none':
@@ -347,26 +479,15 @@ class Graph:
     def set_from_input(self,A,input,coord):
         """ Tries to compute a variable of name coord from an input, usually a string or number, using the data A"""
         # We first check if axis defined by a row/column number
-        X=self.X;x=X
-        Y=self.Y;y=Y
-
         if input is not None:
-            if input.startswith('aut') and input.endswith("auto"):
+            if is_auto(input):
                 if self.mode == 'h':
                     return array(range(len(A[0, :])))
                 else:
                     return array(range(len(A[:, 0])))
             else:
-                input = sio.word_substitute_from_dict(input, self.label_dict)
-
-                #  columns can be written as __1__ -> A[:,1] (vertical) or A[1,:] (horizontal)
-                if self.mode == 'v':
-                    input = sio.template_wrapping_substitute(input, {"__": "A[:,__]"})
-                else:
-                    input = sio.template_wrapping_substitute(input, {"__": "A[__,:]"})
-
                 try:
-                    return eval(input)
+                    return self.evaluate(A,input)
                 except:
                     if not coord == "color":
                         raise ValueError('We could note evaluate %s from %s' % (coord, input))
@@ -376,6 +497,11 @@ class Graph:
         else:
             return []
 
+    def evaluate(self,A,input):
+        """ Evaluates an expression with the data A, and the current X and Y (cf compile_expression) """
+        code = compile_expression(input, self.mode, tuple(self.label_dict.items()))
+        return eval(code, globals(), {'A': A, 'X': self.X, 'x': self.X, 'Y': self.Y, 'y': self.Y})
+
     def substitute_label(self,input,A,label):
         """ Substitutes names by values"""
         i=self.label_dict[label]
@@ -386,68 +512,200 @@ class Graph:
         return input.replace(label,replace)
 
     def set_A_range(self,A,in_range):
-        """ Selects only a range of data """
-        # first we need to make data horizontal for the range operation
-        if self.mode=='h':
-            B=A.transpose()
-        else:
-            B=A.copy()
-        if len(in_range)>0:
-            srange=in_range.split(":")
-            lr=len(srange)
-            try :
-                iii=array([int(s) for s in srange])
-                if lr==1:
-                    B=array([B[iii[0]]])
-                elif lr==2:
-                    B=B[iii[0]:iii[1]]
-                elif lr==3:
-                    B=B[iii[0]:iii[2]:iii[1]]
-                else:
-                    #print('Range must be of the format begin:end or begin:range')
-                    raise ValueError('Range must be of the format begin:end or begin:step:end')
-            except:
-                raise ValueError('Cannot convert Range to adequate format (note : range must be of the format begin:end or begin:step:end)')
+        """ Selects only a range of data (lines, resp. columns in horizontal mode), as a view of A """
+        if not len(in_range)>0:
+            return A
+        srange=in_range.split(":")
+        lr=len(srange)
+        try :
+            iii=[int(s) for s in srange]
+            if lr==1:
+                # a single line, kept as a 2D array
+                points=slice(iii[0],iii[0]+1 if iii[0]!=-1 else None)
+            elif lr==2:
+                points=slice(iii[0],iii[1])
+            elif lr==3:
+                points=slice(iii[0],iii[2],iii[1])
+            else:
+                raise ValueError('Range must be of the format begin:end or begin:step:end')
+        except:
+            raise ValueError('Cannot convert Range to adequate format (note : range must be of the format begin:end or begin:step:end)')
         if self.mode=='h':
-            A=B.transpose()
-        else:
-            A=B.copy()
-
-        return A
-
+            return A[:,points]
+        return A[points]
 
     def set_A_condition(self,A,cond):
         """ Selects data by condition """
+        if len(cond)>0:
+            kept=self.condition_mask(A,cond)
+            if self.mode=='h':
+                return A[:,kept]
+            return A[kept]
+        return A
+
+    def condition_mask(self,A,cond):
+        """ A boolean array telling which data points are kept by a condition, evaluated with A, X and Y """
+        try:
+            kept=asarray(self.evaluate(A,cond))
+        except:
+            raise ValueError('Cannot understand condition. Hint use : if=\'A[:,2]>0.5\' ')
+        if kept.dtype==bool:
+            return kept
+        # the condition gave indices of points
         if self.mode=='h':
-            B=A.transpose()
+            mask=zeros(A.shape[1],dtype=bool)
         else:
-            B=A.copy()
+            mask=zeros(A.shape[0],dtype=bool)
+        mask[kept]=True
+        return mask
 
+    def select_rows(self,values,input,kept):
+        """ Values of the data points kept by a condition ; automatic values are numbered again """
+        if input is not None and is_auto(input):
+            return arange(count_nonzero(kept))
+        if isinstance(values,ndarray) and values.ndim and len(values)==len(kept):
+            return values[kept]
+        return values
 
-        if len(cond)>0:
-            X=self.X;x=X
-            Y=self.Y;y=Y
 
-            cond = sio.word_substitute_from_dict(cond, self.label_dict)
+def is_auto(input):
+    """ Tells whether an expression asks for automatic values (0, 1, 2...) """
+    return isinstance(input, str) and input.startswith('aut') and input.endswith("auto")
 
-            #  columns can be written as __1__ -> A[:,1] (vertical) or A[1,:] (horizontal)
-            if self.mode == 'v':
-                cond = sio.template_wrapping_substitute(cond, {"__": "A[:,__]"})
-            else:
-                cond = sio.template_wrapping_substitute(cond, {"__": "A[__,:]"})
 
-            try:
-                kept=eval(cond)
-                if self.mode=='h':
-                    B=B[kept]
-                    A=B.transpose()
-                else:
-                    A=A[kept]
-            except:
-                raise ValueError('Cannot understand condition. Hint use : if=\'A[:,2]>0.5\' ')
+@lru_cache(maxsize=1024)
+def compile_expression(expression, mode, label_items=()):
+    """
+    Compiles an expression into a code object, after replacing labels (label_items, pairs of label and column)
+        and columns written as __1__ by A[:,1] (mode 'v') or A[1,:] (mode 'h')
+    Compiled expressions are cached : graphs using the same expressions do not parse them again
+    """
+    expression = sio.word_substitute_from_dict(expression, dict(label_items))
+    if mode == 'v':
+        expression = sio.template_wrapping_substitute(expression, {"__": "A[:,__]"})
+    else:
+        expression = sio.template_wrapping_substitute(expression, {"__": "A[__,:]"})
+    return compile(expression, '<%s>' % expression, 'eval')
 
-        return A
 
+# Columns of A used by expressions, as __N__ or A[:,N]
+column_reference = re.compile(r'__(\d+)__|(?<![\w.])A\[\s*:\s*,\s*(\d+)\s*\]')
+# Other uses of A, or of X,Y,x,y (initially the first two columns of A)
+whole_A_reference = re.compile(r'__|(?<![\w.])A(?!\w)')
+first_columns_reference = re.compile(r'(?<![\w.])[XYxy](?!\w)')
+
+
+def make_column_selector(expressions):
+    """
+    Makes a function telling, from the list of column labels, which columns of A are needed to evaluate expressions
+    Columns can be used as __N__, A[:,N], or by their label ; the function returns None (all columns are needed)
+        if an expression uses A in any other way
+    """
+    columns = set()
+    expressions = [expression for expression in expressions if expression is not None and len(expression)]
+    for expression in expressions:
+        if not type(expression) == str:
+            return None
+    expressions = [expression for expression in expressions
+                   if not (expression.startswith('aut') and expression.endswith('auto'))]
+    for expression in expressions:
+        for match in column_reference.finditer(expression):
+            columns.add(int(match.group(1) or match.group(2)))
+        if whole_A_reference.search(column_reference.sub('', expression)):
+            return None
+        if first_columns_reference.search(expression):
+            columns.update([0, 1])
+
+    def select(labels):
+        selected = set(columns)
+        for i, label in enumerate(labels):
+            if label is None:
+                continue
+            label = str(label)
+            # a label that could be part of a column reference could be substituted anywhere
+            if not len(label.strip('A[:,]_0123456789 ')):
+                return None
+            for expression in expressions:
+                if label in expression:
+                    selected.add(i)
+                    break
+        return sorted(selected)
+
+    return select
+
+
+def remap_columns(expression, columns):
+    """ Rewrites the column numbers of an expression (__N__ or A[:,N]) as positions in the list of kept columns """
+    if expression is None or not type(expression) == str:
+        return expression
+    position = {column: i for i, column in enumerate(columns)}
+
+    def remap(match):
+        if match.group(1) is not None:
+            return '__%s__' % position.get(int(match.group(1)), match.group(1))
+        return 'A[:,%s]' % position.get(int(match.group(2)), match.group(2))
+
+    return column_reference.sub(remap, expression)
+
+
+def decimate_minmax(Y,columns):
+    """
+    Indices of the points to keep to draw a line : first, last, min and max point of each pixel column
+    columns is the (non-decreasing) index of the pixel column of each point
+    """
+    n=len(Y)
+    starts=flatnonzero(concatenate([[True],columns[1:]!=columns[:-1]]))
+    group=cumsum(concatenate([[0],(columns[1:]!=columns[:-1]).astype(int64)]))
+    ends=concatenate([starts[1:],[n]])-1
+    kept=[starts,ends]
+    # the first min and max of each column (nan values are ignored)
+    for extremum in [fmin,fmax]:
+        values=extremum.reduceat(Y,starts)
+        candidates=flatnonzero(Y==values[group])
+        firsts=unique(group[candidates],return_index=True)[1]
+        kept.append(candidates[firsts])
+    return unique(concatenate(kept))
+
+
+def decimate_lttb(X,Y,n_out):
+    """
+    Indices of n_out points to keep to draw a line, by the Largest-Triangle-Three-Buckets method :
+        the points are split into buckets of equal counts, and in each bucket the point forming the largest triangle
+        with the point kept in the previous bucket and the average of the next bucket is kept
+    """
+    n=len(X)
+    if n_out>=n or n_out<3:
+        return arange(n)
+    edges=linspace(1,n-1,n_out-1).astype(int64)
+    edges=concatenate([edges,[n]])
+    kept=zeros(n_out,dtype=int64)
+    a=0
+    for i in range(n_out-2):
+        start,stop=edges[i],edges[i+1]
+        next_start,next_stop=edges[i+1],edges[i+2]
+        if next_stop<=next_start:
+            next_start,next_stop=n-1,n
+        xm=X[next_start:next_stop].mean()
+        ym=Y[next_start:next_stop].mean()
+        area=abs((X[a]-xm)*(Y[start:stop]-Y[a])-(X[a]-X[start:stop])*(ym-Y[a]))
+        a=start+int(nanargmax(area)) if not isnan(area).all() else start
+        kept[i+1]=a
+    kept[-1]=n-1
+    return kept
+
+
+def histogram_edges(X,bins,log=0):
+    """ Edges of bins regular cells covering X, in logarithmic scale if log """
+    if log:
+        return 10**histogram_bin_edges(log10(X),bins)
+    return histogram_bin_edges(X,bins)
+
+
+def histogram_centers(edges,log=0):
+    """ Centers of cells from their edges, in logarithmic scale if log """
+    if log:
+        return sqrt(edges[:-1]*edges[1:])
+    return (edges[:-1]+edges[1:])/2.0
 
 
 def get_histogram(Y,bins='auto'):
@@ -1,4 +1,7 @@
 """ A dictionary of keywords to be translated """
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
 def get_keywords():
 
     kw_dict={
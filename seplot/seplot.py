@@ -49,23 +49,11 @@ __VERSION__ = "2.2.6"
 
 
 
-
-# Basic set of colours, symbols, and lines
-csl=sd.get_colors_symbols_lines()
-colours=csl['colours']
-colour_strings=csl['colour_strings']
-symbols=csl['symbols']
-linests=csl['linests']
-# dictionaries
-dicos=sd.get_dictionaries()
-col_dict=dicos['colors']
-linst_dict=dicos['lines']
-symst_dict=dicos['symbols']
-linw_dict=dicos['widths']
-grad_dict=dicos['gradients']
-kw_dict=kd.get_keywords()
+# Dictionaries of styles and keywords are made on first use (cf style_dictionaries, kw_dictionaries)
 
 __SPLIT_MARK__ = '--split_mark--'
+# Resolution (dots per inch) of the pixel columns used for decimation
+__DECIMATE_DPI__ = 300
 
 def version():
     return __VERSION__
@@ -135,6 +123,7 @@ class Toplot:
         _kwargs = {}
 
         # we may need to translate some arguments
+        kw_dict = kd.get_keywords()
         keys = kw_dict.keys()
         for arg in list(_args):
             if arg.find('=')>0:
@@ -224,6 +213,10 @@ class Splotter:
         """ if we auto label axes """
         self.equalaxis = 0
         """ if axes are equal """
+        self.decimate = None
+        """ decimation of line plots : minmax or lttb (cf Graph.decimate) """
+        self.verbose = 0
+        """ if we report what is done """
         self.future_plots=[]
         """ the list items to be plotted, """
         self.graphs=[]
@@ -329,6 +322,15 @@ class Splotter:
                 self.autolabel=1
             elif arg.startswith('-equal'):
                 self.equalaxis=1
+            elif arg.startswith('decimate='):
+                self.decimate=arg[9:]
+                if self.decimate in ['none','None','0']:
+                    self.decimate=None
+                elif self.decimate not in ['minmax','lttb']:
+                    sio.custom_warn('Could not understand decimation from %s (use minmax or lttb)' %self.decimate)
+                    self.decimate=None
+            elif arg.startswith('-verbose'):
+                self.verbose=1
             elif arg.startswith('-xlog'):
                 self.xlog=1
             elif arg.startswith('-ylog'):
@@ -403,6 +405,9 @@ class Splotter:
         for i,toplot in enumerate(self.future_plots):
             (args,kwargs)=toplot.unpack_arguments()
             kwargs['numr']=i
+            # density plots are binned in the scale of the axes
+            kwargs['xlog']=self.xlog
+            kwargs['ylog']=self.ylog
             self.graphs.append(Graph(*args,**kwargs))
 
         # Not a great option thou
@@ -448,8 +453,12 @@ class Splotter:
         else:
             yaxis=axis.linear(title=self.ylabel,min=self.ymin,max=self.ymax)
 
+        if self.decimate:
+            self.decimate_graphs()
+
         backgroundattrs = None
         if self.bgcolor is not None:
+            col_dict = sd.get_dictionaries()['colors']
             if self.bgcolor in col_dict.keys():
                 backgroundattrs=[deco.filled([col_dict[self.bgcolor]])]
             else:
@@ -487,10 +496,9 @@ class Splotter:
         """ A wrapper for PyX.graph.plot """
         if graf.is_function==1:
             graf.ploted=self.graph.plot(graph.data.function(graf.function_string,points=graf.n_points,title=graf.legend),graf.style)
-        elif graf.is_histogram==1:
-            graf.ploted=self.graph.plot([graph.data.points([(x,graf.Y[i]) for i, x in enumerate(graf.X[:])], x=1, y=2,title=graf.legend)],graf.style)
         else:
-            graf.ploted=self.graph.plot([graph.data.points([(x,graf.Y[i],graf.dX[i],graf.dY[i],graf.S[i],graf.C[i]) for i, x in enumerate(graf.X[:])], x=1, y=2,dx=3,dy=4,size=5,color=6,title=graf.legend)],graf.style)
+            # PyX reads the columns used by the style directly from the arrays
+            graf.ploted=self.graph.plot([graph.data.values(title=graf.legend,**graf.plot_columns())],graf.style)
 
     def save_plot(self, *args, out=None, **kwargs):
         """ Saving canvas to a file """
@@ -518,6 +526,32 @@ class Splotter:
         self.ymax=self.xmax
         self.ymin=self.xmin
 
+    def decimate_graphs(self):
+        """ Reduces line plots to a few points per pixel column of the figure, with the x axis range and scale """
+        pixels=int(self.width/2.54*__DECIMATE_DPI__)
+        xmin=self.xmin
+        xmax=self.xmax
+        if xmin is None or xmax is None:
+            # the axis range is set by data
+            values=[array(graf.X,dtype=float) for graf in self.graphs if not graf.is_function and len(graf.X)]
+            if self.xlog:
+                values=[v[v>0] for v in values]
+            values=[v[isfinite(v)] for v in values]
+            values=[v for v in values if len(v)]
+            if not len(values):
+                return
+            if xmin is None:
+                xmin=amin([v.min() for v in values])
+            if xmax is None:
+                xmax=amax([v.max() for v in values])
+        for i,graf in enumerate(self.graphs):
+            (n,kept)=graf.decimate(self.decimate,xmin,xmax,pixels,xlog=self.xlog,ylog=self.ylog)
+            if self.verbose:
+                if kept<n:
+                    print('Plot %s : %s points decimated to %s (%s, ratio %.1f)' %(i,n,kept,self.decimate,n/kept))
+                else:
+                    print('Plot %s : %s points, not decimated' %(i,n))
+
     def get_data_extrema(self):
         minv=sys.float_info.max
         maxv=-minv
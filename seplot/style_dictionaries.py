@@ -1,6 +1,9 @@
 """ Dictionaries of styles """
 from pyx import *
+from functools import lru_cache
 
+# Dictionaries are made once, on first use, and shared by all modules
+@lru_cache(maxsize=None)
 def get_colors_symbols_lines():
     colour_strings=['black','dark','medium','light','blue','red','green']
     colours=[color.gray(0.0),color.gray(0.5),color.rgb.red,color.rgb.blue]
@@ -9,6 +12,7 @@ def get_colors_symbols_lines():
     return {'colours': colours, 'symbols': symbols, 'linests': linests, 'colour_strings': colour_strings}
 
 # Dictionaries
+@lru_cache(maxsize=None)
 def get_dictionaries():
     col_dict= {
         'red' : color.rgb.red,
@@ -6,28 +6,9 @@ from pyx import *
 import sio_tools as sio
 
 
-import seplot.kw_dictionaries as kd
 import seplot.style_dictionaries as sd
 
-
-# Basic set of colours, symbols, and lines
-csl=sd.get_colors_symbols_lines()
-colours=csl['colours']
-colour_strings=csl['colour_strings']
-symbols=csl['symbols']
-linests=csl['linests']
-# dictionaries
-dicos=sd.get_dictionaries()
-col_dict=dicos['colors']
-linst_dict=dicos['lines']
-symst_dict=dicos['symbols']
-linw_dict=dicos['widths']
-grad_dict=dicos['gradients']
-kw_dict=kd.get_keywords()
-
-
-
-
+# Dictionaries of colours, symbols and lines are made on first use (cf style_dictionaries)
 
 
 class Style:
@@ -49,6 +30,8 @@ class Style:
         """ Style for error barys"""
         self.stroke_style=[]
         """ Actual stroke style """
+        self.columns=['x','y']
+        """ Data columns used by the style """
         if numr:
             kwargs['numr']=numr
         self.goodstyle=Goodstyle(*args,**kwargs)
@@ -61,7 +44,7 @@ class Style:
             if self.goodstyle.setcolor:
                 self.dxy=[self.goodstyle.linew,self.goodstyle.setcolor]
             else:
-                self.dxy=[self.goodstyle.linew,colours[0]]
+                self.dxy=[self.goodstyle.linew,sd.get_colors_symbols_lines()['colours'][0]]
 
         if self.goodstyle.kind=='symbol':
             symbol_dict={**vars(self.goodstyle)}
@@ -77,12 +60,34 @@ class Style:
             else:
                 self.style=[graph.style.line([self.goodstyle.linest,self.goodstyle.linew,self.goodstyle.setcolor]),graph.style.errorbar(errorbarattrs=self.dxy)]
 
-        elif self.goodstyle.kind=='histogram':
+        # Errors, size and color are only passed to PyX when they are drawn
+        if len(self.dxy) and self.goodstyle.kind in ['symbol','line']:
+            if dx is not None:
+                self.columns.append('dx')
+            if dy is not None:
+                self.columns.append('dy')
+        if self.goodstyle.kind=='symbol':
+            if self.goodstyle.setsize<0:
+                self.columns.append('size')
+            if not self.goodstyle.setcolor:
+                self.columns.append('color')
+
+        if self.goodstyle.kind=='histogram':
             #self.style=[graph.style.bar()]
             self.style=[graph.style.histogram(lineattrs=[self.goodstyle.linew,self.goodstyle.setcolor],fillable=1)]
 
             self.stroke_style=self.goodstyle.stroke_style
 
+        elif self.goodstyle.kind=='density':
+            # counts are scaled from 0 to 1, as colors from data (cf Graph.make_density)
+            coloraxis=graph.axis.lin(min=0,max=1)
+            if self.goodstyle.density=='cells':
+                self.style=[graph.style.rect(gradient=self.goodstyle.gradient,coloraxis=coloraxis,keygraph=None)]
+                self.columns=['xmin','xmax','ymin','ymax','color']
+            else:
+                self.style=[graph.style.density(gradient=densitygradient(self.goodstyle.gradient),coloraxis=coloraxis,keygraph=None)]
+                self.columns=['x','y','color']
+
 
 class Goodstyle:
     """
@@ -91,24 +96,27 @@ class Goodstyle:
     def __init__(self,*args,
                 numr=0,
                 col='',siz=None,line='',stil=None,gradient='',
-                is_function=0,color_from_data=False,
+                is_function=0,color_from_data=False,density=None,
                 **kwargs):
 
         if siz is None:
             siz = ''
         if stil is None:
             stil = ''
+        csl=sd.get_colors_symbols_lines()
+        colours=csl['colours']
+        dicos=sd.get_dictionaries()
         self.kind='symbol'
         """ kind of plot : symbol, line, etc."""
         self.setcolor=colours[int(ceil(numr/4)) %4]
         """ color set to be plotted"""
-        self.symbol=symbols[numr %4]
+        self.symbol=csl['symbols'][numr %4]
         """ what kind of symbol to plot"""
         self.setsize=0.5
         """ size of the symbol"""
         self.linew=style.linewidth.thin
         """ linewidth"""
-        self.linest=linests[numr %4]
+        self.linest=csl['linests'][numr %4]
         """ linestyle """
         self.gradient=color.gradient.Rainbow;
         """ gradient colors"""
@@ -122,7 +130,7 @@ class Goodstyle:
         if col and not color_from_data:
             try :
                 # We first try to set it from the dictionary
-                self.setcolor=col_dict[col]
+                self.setcolor=dicos['colors'][col]
             except :
                 if not col.startswith('color.'):
                     # shorthand notation is tolerated
@@ -138,7 +146,7 @@ class Goodstyle:
         if gradient:
             try :
                 # We first try to set it from the dictionary
-                self.gradient=grad_dict[gradient]
+                self.gradient=dicos['gradients'][gradient]
             except :
                 if not gradient.startswith('color.gradient'):
                     # shorthand notation is tolerated
@@ -187,7 +195,7 @@ class Goodstyle:
                     sio.custom_warn('Could not understand line width from %s' %line)
             else:
                 try:
-                    self.linew=linw_dict[line]
+                    self.linew=dicos['widths'][line]
                 except:
                     sio.custom_warn('Could not understand line width from %s' %line)
 
@@ -196,11 +204,11 @@ class Goodstyle:
                 self.kind='histogram'
             else:
                 try:
-                    self.linest=linst_dict[stil]
+                    self.linest=dicos['lines'][stil]
                     self.kind='line'
                 except:
                     try:
-                        self.symbol=symst_dict[stil]
+                        self.symbol=dicos['symbols'][stil]
                         self.kind='symbol'
                     except:
                         sio.custom_warn('Could not understand style from %s' %stil)
@@ -218,6 +226,21 @@ class Goodstyle:
             if stil.startswith('B'):
                 self.stroke_style=[deco.filled([self.setcolor])]
 
+        self.density=density
+        """ density plot drawing : bitmap or cells """
+        if density:
+            self.kind='density'
+
+class densitygradient(color.rgbgradient):
+    """
+    An rgb gradient (as needed by bitmaps) giving no color for nan : empty cells of density plots are transparent
+    """
+    def getcolor(self, param):
+        if isnan(param):
+            raise ValueError('No color for nan')
+        return color.rgbgradient.getcolor(self, param)
+
+
 class changesymbol(graph.style.symbol):
     """
      A flexible symbol class derived from PyX's very own changesymbol class
@@ -228,7 +251,7 @@ class changesymbol(graph.style.symbol):
                        symbol=graph.style.symbol.triangle,
                        symbolattrs=[deco.filled, deco.stroked],
                        setsize=0.5,kind='symbol',linew=False,linest=False,
-                       setcolor=color.gray(0.0),numr=0,stroke_style=None,
+                       setcolor=color.gray(0.0),numr=0,stroke_style=None,density=None,
                        **kwargs):
         # add some configuration parameters and modify some other
         self.sizecolumnname = sizecolumnname
@@ -241,12 +264,17 @@ class changesymbol(graph.style.symbol):
         graph.style.symbol.__init__(self, symbol=symbol, symbolattrs=symbolattrs, **kwargs)
 
     def columnnames(self, privatedata, sharedata, agraph, columnnames, dataaxisnames):
-        """ register the new column names"""
-        if self.sizecolumnname not in columnnames:
-            raise ValueError("column '%s' missing" % self.sizecolumnname)
-        if self.colorcolumnname not in columnnames:
-            raise ValueError("column '%s' missing" % self.colorcolumnname)
-        return ([self.sizecolumnname, self.colorcolumnname] +
+        """ register the new column names : size and color are only needed if they are read from data """
+        names=[]
+        if self.setsize<0:
+            if self.sizecolumnname not in columnnames:
+                raise ValueError("column '%s' missing" % self.sizecolumnname)
+            names.append(self.sizecolumnname)
+        if not self.setcolor:
+            if self.colorcolumnname not in columnnames:
+                raise ValueError("column '%s' missing" % self.colorcolumnname)
+            names.append(self.colorcolumnname)
+        return (names +
                 graph.style.symbol.columnnames(self, privatedata, sharedata, agraph,
                                                columnnames, dataaxisnames))
 
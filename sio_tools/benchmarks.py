@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+# !/usr/bin/env python
+"""
+# SYNOPSIS
+
+   Benchmarks for sio_tools
+
+# SYNTAX
+
+   python -m sio_tools.benchmarks [BENCHMARK [BENCHMARK_2 ...]] [OPTION=VALUE]
+
+   Without a benchmark name, all benchmarks are run
+   Options are passed as keyword arguments to the benchmarks, e.g. rows=100000 cols=10
+   The exit status is 1 if a benchmark with a budget (import_time) is over budget
+"""
+import sys
+import os
+import time
+import tempfile
+import subprocess
+import numpy as np
+from sio_tools import sio_tools as sio
+
+
+def timeit(function, *args, repeat=3, **kwargs):
+    """ Best wall time of repeat calls to function(*args,**kwargs) """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(name, timings):
+    """ Prints timings (a dict {label : seconds}) relative to the first one """
+    print(name)
+    reference = None
+    for label, seconds in timings.items():
+        if reference is None:
+            reference = seconds
+        print('    %-24s %10.4f s   x%.1f' % (label, seconds, reference / seconds if seconds > 0 else float('inf')))
+
+
+def make_synthetic_lines(rows=100000, cols=10, comment_every=0, seed=0):
+    """ Lines of space separated random values, with a comment line every comment_every lines """
+    values = np.random.default_rng(seed).random((rows, cols))
+    lines = []
+    for i, row in enumerate(values):
+        if comment_every and not i % comment_every:
+            lines.append('%% comment %s\n' % i)
+        lines.append('%s\n' % ' '.join('%.8g' % v for v in row))
+    return lines
+
+
+def bench_getdata_lines(rows=100000, cols=10, **kwargs):
+    """ Compares the python and numpy engines of sio.getdata_lines, reading only two columns, and ragged rows """
+    lines = make_synthetic_lines(int(rows), int(cols))
+    timings = {}
+    for engine in ['python', 'numpy']:
+        timings['engine=%s' % engine] = timeit(sio.getdata_lines, lines, engine=engine)
+    timings['engine=numpy, 2 columns'] = timeit(sio.getdata_lines, lines, usecols=[0, int(cols) - 1])
+    timings['engine=numpy, ragged'] = timeit(sio.getdata_lines, lines, ragged=True)
+    report('getdata_lines : %s rows x %s columns' % (rows, cols), timings)
+    return timings
+
+
+def legacy_remove_comments(lines, *args, **kwargs):
+    """ The former remove_comments, removing lines with list.pop, kept as a reference """
+    for c in sio.__COMMENTS__:
+        l = len(lines)
+        j = 0
+        while l > 0 and j < l:
+            k = lines[j].find(c)
+            if k > 0:
+                lines[j] = lines[j][:k]
+                if len(lines[j].split()):
+                    j = j + 1
+                else:
+                    lines.pop(j)
+                    l = l - 1
+            elif k == 0:
+                lines.pop(j)
+                l = l - 1
+            else:
+                j = j + 1
+    return lines
+
+
+def bench_comments(rows=100000, cols=10, comment_every=2, **kwargs):
+    """ Compares ways of splitting header and body and parsing a file with many comment lines """
+    lines = make_synthetic_lines(int(rows), int(cols), comment_every=int(comment_every))
+    with tempfile.TemporaryDirectory() as folder:
+        fname = os.path.join(folder, 'comments.txt')
+        sio.savelines(lines, fname)
+        timings = {
+            'remove_comments (legacy)': timeit(lambda: legacy_remove_comments(list(lines))),
+            'remove_comments': timeit(lambda: sio.remove_comments(list(lines))),
+            'txt import, python': timeit(sio.txt_import_wrapper, fname, engine='python'),
+            'txt import, numpy': timeit(sio.txt_import_wrapper, fname),
+            'txt import, single pass': timeit(sio.txt_import_wrapper, fname, keep_lines=False),
+        }
+    report('comment-heavy file : %s rows x %s columns, a comment every %s lines' % (rows, cols, comment_every),
+           timings)
+    return timings
+
+
+def bench_parallel(rows=1000000, cols=10, workers=None, **kwargs):
+    """ Compares the single pass import of a large text file with its parallel import by workers processes """
+    workers = int(workers) if workers is not None else (os.cpu_count() or 1)
+    lines = make_synthetic_lines(int(rows), int(cols), comment_every=1000)
+    with tempfile.TemporaryDirectory() as folder:
+        fname = os.path.join(folder, 'large.txt')
+        sio.savelines(lines, fname)
+        lines = None
+        if not np.array_equal(sio.scan_text_file(fname)[0],
+                              sio.scan_text_file_parallel(fname, workers=workers, range_bytes=2 ** 20)[0]):
+            raise ValueError('scan_text_file_parallel does not match scan_text_file')
+        timings = {
+            'single pass': timeit(sio.scan_text_file, fname, repeat=1),
+            '%s workers' % workers: timeit(sio.scan_text_file_parallel, fname, workers=workers, range_bytes=2 ** 20,
+                                           repeat=1),
+        }
+    report('large file : %s rows x %s columns' % (rows, cols), timings)
+    return timings
+
+
+def make_synthetic_tree(root, depth=6, branching=3, files=20, ext='.txt'):
+    """ Makes a tree of folders of given depth and branching, with files in every folder """
+    count = 0
+    folders = [root]
+    for level in range(depth + 1):
+        next_folders = []
+        for folder in folders:
+            for i in range(files):
+                open(os.path.join(folder, 'run_%s%s' % (i, ext if i % 2 else '.log')), 'w').close()
+                count += 1
+            if level < depth:
+                for j in range(branching):
+                    sub = os.path.join(folder, 'sub_%s' % j)
+                    os.mkdir(sub)
+                    next_folders.append(sub)
+        folders = next_folders
+    return count
+
+
+def legacy_recursive_file_list(*args, folder=None, folders=[], include=[''], ext=[''], exclude=sio.__exclude_key__,
+                               **kwargs):
+    """ The former listdir-based make_recursive_file_list, kept as a reference """
+    liste = []
+    if folder is not None:
+        folders = [folder]
+    for folder in folders:
+        for f in os.listdir(folder):
+            f = os.path.join(folder, f)
+            if os.path.isdir(f):
+                liste += legacy_recursive_file_list(folder=f, ext=ext, include=include, exclude=exclude)
+            else:
+                for extension in ext:
+                    if f.endswith(extension):
+                        is_included = [f.find(inc) >= 0 for inc in include]
+                        is_not_excluded = [f.find(exc) < 0 for exc in exclude]
+                        if all(is_included) and all(is_not_excluded):
+                            liste += [f]
+    return liste
+
+
+def bench_recursive_file_list(depth=6, branching=3, files=20, **kwargs):
+    """ Compares the listdir-based and scandir-based recursive file lists on a synthetic tree """
+    with tempfile.TemporaryDirectory() as root:
+        count = make_synthetic_tree(root, depth=int(depth), branching=int(branching), files=int(files))
+        options = {'folder': root, 'ext': ['.txt'], 'include': ['run'], 'exclude': ['run_1.']}
+        if sorted(legacy_recursive_file_list(**options)) != sorted(sio.make_recursive_file_list(**options)):
+            raise ValueError('make_recursive_file_list does not match the legacy file list')
+        timings = {
+            'listdir (legacy)': timeit(legacy_recursive_file_list, **options),
+            'scandir': timeit(sio.make_recursive_file_list, **options),
+            'scandir, first file': timeit(lambda: next(sio.iter_recursive_file_list(**options))),
+        }
+    report('recursive file list : %s files, depth %s, branching %s' % (count, depth, branching), timings)
+    return timings
+
+
+def legacy_plot_points(graf):
+    """ The former data hand-off from Splotter.plot to PyX, one tuple per point, kept as a reference """
+    from pyx import graph
+    return graph.data.points([(x, graf.Y[i], graf.dX[i], graf.dY[i], graf.S[i], graf.C[i]) for i, x in enumerate(graf.X[:])],
+                             x=1, y=2, dx=3, dy=4, size=5, color=6, title=graf.legend)
+
+
+def render_plot(graf, data, fname):
+    """ Draws data with the style of graf into a pdf file, with axes without labels (no TeX needed) """
+    from pyx import canvas, graph
+    axis = lambda: graph.axis.linear(painter=graph.axis.painter.regular(labelattrs=None))
+    plot = graph.graphxy(width=8, x=axis(), y=axis(), key=None)
+    plot.plot([data], graf.style)
+    plot.finish()
+    page = canvas.canvas()
+    page.insert(plot)
+    page.writePDFfile(fname)
+
+
+def bench_plot_handoff(points='100000,1000000,10000000', legacy_max=1000000, render_max=100000, **kwargs):
+    """
+    Compares the former per-point tuples with the column arrays passed from seplot to PyX, for each number of points
+    Plots of up to render_max points are also drawn into a pdf file ; tuples are only built up to legacy_max points
+    """
+    from pyx import graph
+    from seplot.grapher import Graph
+    for n in [int(float(n)) for n in str(points).split(',')]:
+        data = np.random.default_rng(0).random((n, 2))
+        graf = Graph(data=data, stil='-')
+        timings = {}
+        if n <= int(float(legacy_max)):
+            timings['tuples (legacy)'] = timeit(legacy_plot_points, graf)
+        timings['columns'] = timeit(lambda: graph.data.values(title=None, **graf.plot_columns()))
+        if n <= int(float(render_max)):
+            with tempfile.TemporaryDirectory() as folder:
+                fname = os.path.join(folder, 'plot.pdf')
+                timings['tuples, drawn (legacy)'] = timeit(lambda: render_plot(
+                    graf, legacy_plot_points(graf), fname), repeat=1)
+                timings['columns, drawn'] = timeit(lambda: render_plot(
+                    graf, graph.data.values(title=None, **graf.plot_columns()), fname), repeat=1)
+        report('seplot to PyX hand-off : %s points, line style' % n, timings)
+    return timings
+
+
+# Import time budgets (seconds), and slow modules that must not be imported, for command line tools
+__IMPORT_BUDGETS__ = {
+    'sio_tools': (0.35, ['pandas', 'yaml', 'asyncio', 'sklearn']),
+    'seplot.seplot': (0.8, ['pandas', 'yaml', 'asyncio', 'sklearn']),
+    'ply_convert': (0.5, ['pandas', 'yaml', 'asyncio', 'sklearn']),
+}
+__REPO_PATHS__ = [os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                  os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ply')]
+
+
+def measure_import(module, slow_modules=[], repeat=5):
+    """ Best time to import module in a fresh interpreter, and the slow modules it imported ; ImportError if it fails """
+    code = ("import sys, time; sys.path[:0] = %r; start = time.perf_counter(); import %s; "
+            "print(time.perf_counter() - start); print(','.join(m for m in %r if m in sys.modules))"
+            % (__REPO_PATHS__, module, list(slow_modules)))
+    best = None
+    loaded = []
+    for i in range(repeat):
+        proc = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if proc.returncode:
+            errors = proc.stderr.strip().splitlines()
+            raise ImportError('%s could not be imported : %s' % (module, errors[-1] if len(errors) else 'no error message'))
+        lines = proc.stdout.splitlines()
+        elapsed = float(lines[0])
+        loaded = [m for m in lines[1].split(',') if m]
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, loaded
+
+
+def bench_import_time(modules=None, repeat=5, **kwargs):
+    """
+    Measures the import time of command line tools, and checks it against budgets (cf __IMPORT_BUDGETS__)
+    A module that cannot be imported is over budget
+    returns the timings, and the list of budgets exceeded
+    """
+    if modules is None:
+        modules = list(__IMPORT_BUDGETS__.keys())
+    elif type(modules) == str:
+        modules = modules.split(',')
+    timings = {}
+    failures = []
+    for module in modules:
+        budget, slow_modules = __IMPORT_BUDGETS__.get(module, (None, []))
+        try:
+            elapsed, loaded = measure_import(module, slow_modules=slow_modules, repeat=int(repeat))
+        except ImportError as error:
+            failures.append(str(error))
+            continue
+        timings[module] = elapsed
+        if budget is not None and elapsed > budget:
+            failures.append('%s takes %.3f s to import (budget %.3f s)' % (module, elapsed, budget))
+        if loaded:
+            failures.append('%s imports %s' % (module, ', '.join(loaded)))
+    report('import time', timings)
+    for failure in failures:
+        print('    OVER BUDGET : %s' % failure)
+    return timings, failures
+
+
+__BENCHMARKS__ = {
+    'getdata_lines': bench_getdata_lines,
+    'comments': bench_comments,
+    'parallel': bench_parallel,
+    'recursive_file_list': bench_recursive_file_list,
+    'plot_handoff': bench_plot_handoff,
+    'import_time': bench_import_time,
+}
+
+
+def main(args):
+    names, kwargs = sio.make_args_and_kwargs(args)
+    if not names:
+        names = list(__BENCHMARKS__.keys())
+    over_budget = False
+    for name in names:
+        try:
+            benchmark = __BENCHMARKS__[name]
+        except KeyError:
+            raise ValueError('Unknown benchmark %s (available : %s)' % (name, ', '.join(__BENCHMARKS__.keys())))
+        out = benchmark(**kwargs)
+        if name == 'import_time' and len(out[1]):
+            over_budget = True
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,23 +1,30 @@
 # -*- coding: utf-8 -*-
 # !/usr/bin/env python
 import math
-from numpy import *
+# explicit imports : "from numpy import *" imports all numpy submodules, which is slow
+from numpy import append, arange, array, asarray, ascontiguousarray, concatenate, cumsum, dtype, full, load, loadtxt
+from numpy import memmap, ndarray, newaxis, promote_types, save, stack, zeros
+from numpy.lib import format as npy_format
 import subprocess
 import os.path
 import sys
 import os
 import warnings
 import copy
-import yaml
+import io
+import json
+import hashlib
+import re
+import time
+import shlex
+from functools import partial as partial_call
+from functools import lru_cache
+import builtins
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED
+from concurrent.futures import wait as futures_wait
 
 __VERSION__ = "0.1.12"
 
-try:
-    import pandas as pd
-except:
-    print('Warning : Could not import pandas module')
-    print('Importing csv and xls will not work')
-
 # @TODO : use *args,**kwargs EVERYWHERE
 # @TODO : replace all the concatenate with os.join()
 # @TODO : better cleanup and stuff
@@ -27,6 +34,12 @@ __exclude_key__ = ["__EXCLUDE_KEY__"]
 __COMMENTS__ = ["#", "%"]
 __cleanup_dict__ = {",": "", " ": "", ")": ""}
 __word_clean_tags__ = ['', '\n']
+__BLOCK_ROWS__ = 65536
+__CACHE_DIR__ = os.path.join(os.path.expanduser("~"), ".cache", "sio_tools")
+__CACHE_MAX_BYTES__ = 2 ** 31
+__INDEX_VERSION__ = 2
+# Compressed files : first bytes and extension of each compression format
+__COMPRESSIONS__ = {'gzip': (b'\x1f\x8b', '.gz'), 'bz2': (b'BZh', '.bz2'), 'xz': (b'\xfd7zXZ\x00', '.xz')}
 
 """
 # SYNOPSIS
@@ -39,7 +52,27 @@ __word_clean_tags__ = ['', '\n']
 """
 
 
+# Slow imports (pandas, yaml, asyncio, multiprocessing) are done on first use, to keep importing sio_tools fast
+def import_pandas():
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError('Could not import pandas module : importing csv and xls will not work')
+    return pd
+
+
+def import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet
+        import pyarrow.feather
+    except ImportError:
+        raise ImportError('Could not import pyarrow module : importing parquet and feather will not work')
+    return pa
+
+
 def load_config(name="config.yaml"):
+    import yaml
     config = None
     try :
         file = open(name, 'r')
@@ -64,6 +97,7 @@ def config_to_args_kwargs(config):
 
 
 def save_config(name="config.yaml", *args, **kwargs):
+    import yaml
     config = {'Options': args, 'Parameters': kwargs}
     with open(name, 'w') as outfile:
         yaml.dump(config, outfile, default_flow_style=False)
@@ -114,6 +148,7 @@ def make_exec(fname):
 
 
 # Runs a unic command and returns the stdout
+# (cf run_jobs to run many commands)
 def run_and_return(job, *args, **kwargs):
     if not type(job) == list:
         job = [job, *args, *make_args_from_kwargs(kwargs)]
@@ -121,6 +156,113 @@ def run_and_return(job, *args, **kwargs):
     return proc.stdout.readlines()
 
 
+# Runs many commands concurrently
+def run_jobs(jobs, *args, **kwargs):
+    """
+    Runs a list of jobs, at most workers (default : number of cpus) at the same time
+    a job is a list of arguments, or a string split as a command line
+    Output lines are streamed as they come :
+        to callbacks on_stdout(n, line) and on_stderr(n, line), with n the job number,
+        or to files log_dir/job_N.out and log_dir/job_N.err if log_dir is given,
+        or else are stored in the result
+    timeout : time limit in seconds for each job (a number, or a list with one value per job) ; late jobs are killed
+    returns a list of dictionaries, in the same order as jobs, with keys :
+        job, returncode, timed_out, wall_time, stdout, stderr, error
+    From an already running asyncio loop (e.g. in a notebook), use run_jobs_async
+    """
+    import asyncio
+    return asyncio.run(run_jobs_async(jobs, *args, **kwargs))
+
+
+async def run_jobs_async(jobs, *args, workers=None, timeout=None, **kwargs):
+    """ Coroutine version of run_jobs """
+    import asyncio
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if type(timeout) == list:
+        if len(timeout) != len(jobs):
+            raise ValueError('timeout must be a number or a list of one timeout per job (%s timeouts for %s jobs)'
+                             % (len(timeout), len(jobs)))
+        timeouts = timeout
+    else:
+        timeouts = [timeout] * len(jobs)
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run_one(n, job, job_timeout):
+        async with semaphore:
+            return await run_job_async(n, job, timeout=job_timeout, **kwargs)
+
+    return await asyncio.gather(*[run_one(n, job, timeouts[n]) for n, job in enumerate(jobs)])
+
+
+async def run_job_async(n, job, *args, timeout=None, on_stdout=None, on_stderr=None, log_dir=None, **kwargs):
+    """ Runs job number n, streaming its output line by line (cf run_jobs) """
+    import asyncio
+    if type(job) == str:
+        job = shlex.split(job)
+    result = {'job': job, 'returncode': None, 'timed_out': False, 'wall_time': 0.0, 'stdout': [], 'stderr': [],
+              'error': None}
+    files = []
+    sinks = []
+    for stream, callback, ext in [('stdout', on_stdout, 'out'), ('stderr', on_stderr, 'err')]:
+        if callback is not None:
+            sinks.append(lambda line, callback=callback: callback(n, line))
+        elif log_dir is not None:
+            f = open(os.path.join(log_dir, 'job_%s.%s' % (n, ext)), 'w')
+            files.append(f)
+            sinks.append(f.write)
+        else:
+            sinks.append(result[stream].append)
+
+    start = time.perf_counter()
+    try:
+        proc = await asyncio.create_subprocess_exec(*job, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                    limit=2 ** 24)
+    except OSError as error:
+        result['error'] = '%s: %s' % (type(error).__name__, error)
+        result['wall_time'] = time.perf_counter() - start
+        for f in files:
+            f.close()
+        return result
+
+    try:
+        await asyncio.wait_for(asyncio.gather(read_stream_lines(proc.stdout, sinks[0]),
+                                              read_stream_lines(proc.stderr, sinks[1]),
+                                              proc.wait()), timeout)
+    except asyncio.TimeoutError:
+        result['timed_out'] = True
+        await kill_process(proc)
+    except Exception as error:
+        # e.g. a callback raised, or a line is longer than the reader limit : the job is stopped
+        result['error'] = '%s: %s' % (type(error).__name__, error)
+        await kill_process(proc)
+    finally:
+        for f in files:
+            f.close()
+    result['wall_time'] = time.perf_counter() - start
+    result['returncode'] = proc.returncode
+    return result
+
+
+async def kill_process(proc):
+    """ Kills an asyncio subprocess if it is still running, and waits for it """
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    await proc.wait()
+
+
+async def read_stream_lines(stream, sink):
+    """ Passes the lines of an asyncio stream to sink, one at a time """
+    while True:
+        line = await stream.readline()
+        if not line:
+            return
+        sink(line.decode(errors='replace'))
+
+
 def make_args_from_kwargs(*args, **kwargs):
     for arg in args:
         kwargs = {**arg, **kwargs}
@@ -182,16 +324,8 @@ def switch_words_in_lines(lines, dict):
 
 # Replace some words by others in a single string (line)
 def word_substitute_from_dict(line, dict):
-    for key, value in dict.items():
-        line = line.replace(key, value)
-    return line
-
+    return get_substituter(dict)(line)
 
-# if line.find(key)>=0:
-#	return li
-#	words=line.split(key)
-#	return ''.join([words[0],value,words[1]])
-# return line
 
 def template_wrapping_substitute(line, dict):
     """ substitutes in a line expressions from a dict
@@ -201,16 +335,123 @@ def template_wrapping_substitute(line, dict):
         line = "_1_ + _2_"
         will return "A[:,1] + A[:,2]"
     """
-    # @todo : replace with regexp
-    for key, value in dict.items():
-        splits = line.split(key)
-        l = len(splits)
-        if l > 1:
-            for i in range(1, l, 2):
-                word = value.replace(key, splits[i])
-                splits[i] = word
-        line = "".join(splits)
-    return line
+    return get_substituter(dict, template=True)(line)
+
+
+def get_substituter(dict, template=False):
+    """ A (cached) compiled Substituter or TemplateSubstituter for a dictionary """
+    try:
+        return cached_substituter(tuple(dict.items()), template)
+    except TypeError:
+        # unhashable values
+        if template:
+            return TemplateSubstituter(dict)
+        return Substituter(dict)
+
+
+@lru_cache(maxsize=256)
+def cached_substituter(items, template):
+    if template:
+        return TemplateSubstituter(builtins.dict(items))
+    return Substituter(builtins.dict(items))
+
+
+class Substituter:
+    """
+    Replaces the keys of a dictionary by their values in strings, as successive str.replace calls would
+    When the keys and values cannot interfere (no key overlapping another key or a value),
+        all keys are replaced in one pass of a single compiled expression ; otherwise keys are replaced one by one
+    Results are memoized, so a Substituter should be kept and reused for many strings
+    """
+    def __init__(self, dict, memo_size=4096):
+        self.items = [(str(key), str(value)) for key, value in dict.items()]
+        self.values = builtins.dict(self.items)
+        self.memo = {}
+        self.memo_size = memo_size
+        self.pattern = None
+        if self.items and substitutions_are_independent(self.items):
+            keys = sorted(self.values.keys(), key=len, reverse=True)
+            self.pattern = re.compile('|'.join(re.escape(key) for key in keys))
+
+    def __call__(self, line):
+        try:
+            return self.memo[line]
+        except KeyError:
+            pass
+        if self.pattern is not None:
+            new_line = self.pattern.sub(lambda match: self.values[match.group()], line)
+        else:
+            new_line = line
+            for key, value in self.items:
+                new_line = new_line.replace(key, value)
+        if len(self.memo) >= self.memo_size:
+            self.memo.clear()
+        self.memo[line] = new_line
+        return new_line
+
+
+class TemplateSubstituter:
+    """
+    Substitutes wrapped expressions as template_wrapping_substitute, with a compiled expression for each key
+    Results are memoized, so a TemplateSubstituter should be kept and reused for many strings
+    """
+    def __init__(self, dict, memo_size=4096):
+        self.items = [(key, value, re.compile('%s(.*?)%s' % (re.escape(key), re.escape(key)), re.DOTALL))
+                      for key, value in dict.items() if key]
+        self.memo = {}
+        self.memo_size = memo_size
+
+    def __call__(self, line):
+        try:
+            return self.memo[line]
+        except KeyError:
+            pass
+        new_line = line
+        for key, value, pattern in self.items:
+            if new_line.count(key) % 2:
+                # unpaired wrapper : the last piece is substituted too
+                splits = new_line.split(key)
+                for i in range(1, len(splits), 2):
+                    splits[i] = value.replace(key, splits[i])
+                new_line = "".join(splits)
+            else:
+                new_line = pattern.sub(lambda match: value.replace(key, match.group(1)), new_line)
+        if len(self.memo) >= self.memo_size:
+            self.memo.clear()
+        self.memo[line] = new_line
+        return new_line
+
+
+def substitutions_are_independent(items):
+    """
+    Checks that replacing keys by values all at once gives the same result as replacing them one after the other,
+    i.e. that no key overlaps another key, and that no key can be found in, or made by, a replacement value
+    """
+    keys = [key for key, value in items]
+    values = [value for key, value in items]
+    for key in keys:
+        if not key:
+            return False
+        for other in keys:
+            if other != key and (key in other or strings_overlap(key, other)):
+                return False
+        for value in values:
+            if not value:
+                # deleting text can bring together the two ends of a key
+                if len(key) > 1:
+                    return False
+            elif key in value or value in key or strings_overlap(key, value) or strings_overlap(value, key):
+                return False
+    return True
+
+
+def strings_overlap(a, b):
+    """ True if a proper end of a is the beginning of b """
+    n = len(a) if len(a) < len(b) else len(b)
+    for k in range(1, n):
+        if a[-k:] == b[:k]:
+            return True
+    return False
 
 
 # Cleanup a word ...
@@ -233,25 +474,22 @@ def clean_slash_from_name_end(fname):
 # deprecated ?
 def remove_comments(lines, *args, comments=__COMMENTS__, **kwargs):
     comments = __COMMENTS__
-    for c in comments:
-        l = len(lines)
-        j = 0
-        while l > 0 and j < l:
-            k = lines[j].find(c)
+    kept = []
+    for line in lines:
+        for c in comments:
+            k = line.find(c)
             if k > 0:
-                # print "Corrected midle"
-                lines[j] = lines[j][:k]
-                if len(lines[j].split()):
-                    j = j + 1
-                else:
-                    lines.pop(j)
-                    l = l - 1
+                line = line[:k]
+                if not len(line.split()):
+                    line = None
+                    break
             elif k == 0:
-                lines.pop(j)
-                l = l - 1
-            else:
-                j = j + 1
-        # print "uncorrected"
+                line = None
+                break
+        if line is not None:
+            kept.append(line)
+    # lines are modified in place, as callers may expect
+    lines[:] = kept
     return lines
 
 
@@ -319,7 +557,7 @@ def clean_line_return(line):
 
 
 # Remove end-of-lines (\n) for an array of strings
-def clean_lines(lines):
+def clean_lines(lines, *args, **kwargs):
     for i, line in enumerate(lines):
         lines[i] = clean_line_return(line)
     return [line for line in lines if line and not line.isspace()]
@@ -365,10 +603,24 @@ def isword_file(fname, word):
 
 # makes a file list in current folder
 # @TODO : deprecate this shit
-def make_file_list(part_fname, outro):
+def make_file_list(part_fname, outro, *args, folder='.', index=False, index_dir=None, follow_symlinks=True, **kwargs):
+    """
+    Lists the files of folder (by default the current folder) with a run number : PART_FNAME[number]OUTRO
+    returns a list of [number, name]
+    With index=True, the listing and numbers are read from the file index of folder (cf FileIndex),
+        which only lists folder itself
+    """
+    if index:
+        return FileIndex(folder, index_dir=index_dir, max_depth=0, follow_symlinks=follow_symlinks).run_list(
+            part_fname, outro)
+    return make_run_list(os.listdir(folder), part_fname, outro)
+
+
+def make_run_list(names, part_fname, outro):
+    """ Makes a list of [number, name] from file names of the form PART_FNAME[number]OUTRO """
     liste = []
     l = len(part_fname)
-    for f in os.listdir('.'):
+    for f in names:
         ix = f.find(part_fname)
         if ix >= 0:
             bli = f.find(outro)
@@ -386,55 +638,326 @@ def make_file_list(part_fname, outro):
 
 # Now we're talking
 # makes a file list recursively with include and exclude options !
-# @TODO : document
-# @TODO : search depth
-def make_recursive_file_list(*args, folder=None, folders=[], include=[''], ext=[''], exclude=__exclude_key__, **kwargs):
+def make_recursive_file_list(*args, folder=None, folders=[], index=False, index_dir=None, max_depth=None,
+                             follow_symlinks=True, **kwargs):
     """
     Makes a recursive file list from a location (folder=LOCATION),
     or a set of folders (folders=[LOCATION,LOCATION,LOCATION])
     specific must-contain word parts may be provided ( include=WORD_PART or include=[PART1 , PART2] )
     certain must-not-contain word parts can be excluded ( exclude=WORD_PART or exclude=[PART1 , PART2] )
     an extension can be specified : ( ext=EXTENSION or ext=[EXTENSION1,EXTENSION2])
+    cf iter_recursive_file_list for other options
+    With index=True, files are listed from the file index of each folder (cf FileIndex)
+    """
+    if index:
+        if folder is not None:
+            folders = [folder]
+        liste = []
+        for top in folders:
+            liste += FileIndex(top, index_dir=index_dir, max_depth=max_depth,
+                               follow_symlinks=follow_symlinks).file_list(*args, **kwargs)
+        return liste
+    return list(iter_recursive_file_list(*args, folder=folder, folders=folders, max_depth=max_depth,
+                                         follow_symlinks=follow_symlinks, **kwargs))
+
+
+def iter_recursive_file_list(*args, folder=None, folders=[], include=[''], ext=[''], exclude=__exclude_key__,
+                             max_depth=None, follow_symlinks=True, workers=1, sort=False, **kwargs):
+    """
+    Generator version of make_recursive_file_list, yielding files as they are found
+    Folders are walked depth-first with os.scandir, in the same order as make_recursive_file_list
+    max_depth : maximum depth of sub-folders to look into (0 : only files in folder), None for no limit
+    follow_symlinks : if True, links to folders are walked into (each folder only once, to avoid loops),
+        if False they are ignored
+    workers : if larger than 1, folders are listed concurrently by this many threads,
+        which hides latency on network file systems ; files then come in no particular order
+    sort : if True, files are yielded in sorted order, once all folders have been listed
+    """
+    if folder is not None:
+        folders = [folder]
+    is_match = make_file_matcher(include=include, ext=ext, exclude=exclude)
+
+    if workers > 1:
+        files = walk_folder_trees_threaded(folders, is_match, max_depth=max_depth, follow_symlinks=follow_symlinks,
+                                           workers=workers)
+    else:
+        files = (fname for top in folders
+                 for fname in walk_folder_tree(top, is_match, max_depth=max_depth, follow_symlinks=follow_symlinks))
+    if sort:
+        files = sorted(files)
+    yield from files
+
+
+def walk_folder_tree(top, is_match, *args, max_depth=None, follow_symlinks=True, **kwargs):
+    """ Walks depth-first in a folder, yielding files names for which is_match(name) is True """
+    visited = set()
+    if follow_symlinks:
+        stat = os.stat(top)
+        visited.add((stat.st_dev, stat.st_ino))
+    # a stack of (depth, scandir iterator) : iterators are resumed after exhausting sub-folders
+    stack = [(0, os.scandir(top))]
+    while stack:
+        depth, entries = stack[-1]
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=follow_symlinks):
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                if follow_symlinks:
+                    stat = entry.stat()
+                    if (stat.st_dev, stat.st_ino) in visited:
+                        continue
+                    visited.add((stat.st_dev, stat.st_ino))
+                stack.append((depth + 1, os.scandir(entry.path)))
+                break
+            elif not follow_symlinks and entry.is_symlink() and entry.is_dir():
+                continue
+            elif is_match(entry.path):
+                yield entry.path
+        else:
+            entries.close()
+            stack.pop()
+
+
+def scan_folder(folder, is_match, *args, follow_symlinks=True, list_subfolders=True, **kwargs):
+    """
+    Lists a single folder
+    returns matching files, and a list of (sub-folder, (device, inode)) ; inode is None if links are not followed
+    """
+    files = []
+    subfolders = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=follow_symlinks):
+                if list_subfolders:
+                    if follow_symlinks:
+                        stat = entry.stat()
+                        subfolders.append((entry.path, (stat.st_dev, stat.st_ino)))
+                    else:
+                        subfolders.append((entry.path, None))
+            elif not follow_symlinks and entry.is_symlink() and entry.is_dir():
+                continue
+            elif is_match(entry.path):
+                files.append(entry.path)
+    return files, subfolders
+
+
+def walk_folder_trees_threaded(folders, is_match, *args, max_depth=None, follow_symlinks=True, workers=8, **kwargs):
+    """ Walks in folders listing sub-folders concurrently in a pool of threads, yielding matching file names """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+    # as in walk_folder_tree, each top folder is walked independently
+    visited = [set() for top in folders]
+
+    def submit(folder, depth, n):
+        list_subfolders = max_depth is None or depth < max_depth
+        job = executor.submit(scan_folder, folder, is_match, follow_symlinks=follow_symlinks,
+                              list_subfolders=list_subfolders)
+        pending[job] = (depth, n)
+
+    try:
+        for n, top in enumerate(folders):
+            if follow_symlinks:
+                stat = os.stat(top)
+                visited[n].add((stat.st_dev, stat.st_ino))
+            submit(top, 0, n)
+        while pending:
+            done, not_done = futures_wait(pending.keys(), return_when=FIRST_COMPLETED)
+            for job in done:
+                depth, n = pending.pop(job)
+                files, subfolders = job.result()
+                for subfolder, inode in subfolders:
+                    if inode is not None:
+                        if inode in visited[n]:
+                            continue
+                        visited[n].add(inode)
+                    submit(subfolder, depth + 1, n)
+                yield from files
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def make_file_matcher(*args, include=[''], ext=[''], exclude=__exclude_key__, **kwargs):
+    """
+    Makes a function checking if a file name has one of the extensions ext,
+    contains all words of include and none of exclude
     """
-    liste = []
-    dict = kwargs
     if not type(include) == list:
         include = [include]
     if not type(exclude) == list:
         exclude = [exclude]
     if not type(ext) == list:
         ext = [ext]
+    # Checks that always pass are removed
+    include = [inc for inc in include if inc]
+    ext = tuple(ext)
+    if '' in ext:
+        ext = ()
+    if len(exclude):
+        excluded = re.compile('|'.join(re.escape(exc) for exc in exclude)).search
+    else:
+        excluded = None
 
-    if folder is not None:
-        folders = [folder]
+    def is_match(fname):
+        if ext and not fname.endswith(ext):
+            return False
+        for inc in include:
+            if inc not in fname:
+                return False
+        if excluded is not None and excluded(fname):
+            return False
+        return True
 
-    for folder in folders:
-        for f in os.listdir(folder):
-            f = os.path.join(folder, f)
-            if os.path.isdir(f):
-                dict['folder'] = f
-                dict['ext'] = ext
-                dict['include'] = include
-                dict['exclude'] = exclude
-                liste += make_recursive_file_list(**dict)
-            # elif f.find(include)>=0 and f.endswith(ext) and f.find(exclude)<0:
-            else:
-                for extension in ext:
-                    if f.endswith(extension):
-                        is_included = [f.find(inc) >= 0 for inc in include]
-                        is_not_excluded = [f.find(exc) < 0 for exc in exclude]
-                        if all(is_included) and all(is_not_excluded):
-                            liste += [f]
-    return liste
+    return is_match
 
 
 # Just order stuff
-def make_ordered_file_list(part_fname, outro):
-    liste = make_file_list(part_fname, outro)
+def make_ordered_file_list(part_fname, outro, *args, **kwargs):
+    liste = make_file_list(part_fname, outro, *args, **kwargs)
     liste.sort(key=lambda tup: tup[0])
     return liste
 
 
+class FileIndex:
+    """
+    An on-disk index of the files in a folder tree, to make repeated file listings fast
+    For each sub-folder, the index stores the folder modification time, and the name, size, and modification time
+        of its files. When refreshed, a folder is only listed again if its modification time changed,
+        i.e. if files were added, removed or renamed in it ; sizes and times of modified files may thus be outdated
+    Run lists from make_file_list are stored too
+    max_depth : maximum depth of sub-folders to index (0 : only files in root), None for no limit ;
+        folders deeper than max_depth are neither listed nor dropped from the index
+    follow_symlinks : as in iter_recursive_file_list, links to folders are walked into or ignored
+    The index is saved as json in index_dir (by default ~/.cache/sio_tools/index), under the absolute path of root ;
+        listed files are paths under root as given, as in iter_recursive_file_list
+    """
+    def __init__(self, root, *args, index_dir=None, refresh=True, max_depth=None, follow_symlinks=True, **kwargs):
+        self.folder = root
+        self.root = os.path.abspath(root)
+        self.max_depth = max_depth
+        self.follow_symlinks = follow_symlinks
+        if index_dir is None:
+            index_dir = os.path.join(os.environ.get('SIO_TOOLS_CACHE', __CACHE_DIR__), 'index')
+        key = self.root if follow_symlinks else self.root + '\tno_symlinks'
+        self.fname = os.path.join(index_dir, '%s.json' % hashlib.sha1(key.encode()).hexdigest())
+        self.dirs = {}
+        self.runs = {}
+        try:
+            with open(self.fname, 'r') as f:
+                saved = json.load(f)
+            if saved['root'] == self.root and saved.get('version') == __INDEX_VERSION__:
+                self.dirs = saved['dirs']
+                self.runs = saved['runs']
+        except (OSError, ValueError, KeyError):
+            pass
+        if refresh:
+            self.refresh()
+
+    def refresh(self):
+        """ Updates the index up to max_depth, listing only the folders which changed since the last refresh """
+        dirs = {}
+        changed = False
+        visited = set()
+        stack = [('', 0)]
+        while stack:
+            rel, depth = stack.pop()
+            path = os.path.join(self.root, rel)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # links to folders are followed, but each folder is indexed only once
+            if (stat.st_dev, stat.st_ino) in visited:
+                continue
+            visited.add((stat.st_dev, stat.st_ino))
+            entry = self.dirs.get(rel)
+            if entry is None or entry['mtime_ns'] != stat.st_mtime_ns:
+                entry = self.scan(path, stat.st_mtime_ns, follow_symlinks=self.follow_symlinks)
+                changed = True
+            dirs[rel] = entry
+            if self.max_depth is None or depth < self.max_depth:
+                stack.extend((os.path.join(rel, sub), depth + 1) for sub in reversed(entry['subdirs']))
+        if self.max_depth is not None:
+            # deeper folders were not checked : they are kept as they are
+            for rel, entry in self.dirs.items():
+                if rel not in dirs and rel.count(os.sep) >= self.max_depth:
+                    dirs[rel] = entry
+        if changed or len(dirs) != len(self.dirs):
+            self.dirs = dirs
+            self.save()
+        return self
+
+    @staticmethod
+    def scan(path, mtime_ns, follow_symlinks=True):
+        """ Lists a single folder ; names are all its entries, in the order of os.listdir """
+        files = {}
+        subdirs = []
+        names = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                names.append(entry.name)
+                try:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        subdirs.append(entry.name)
+                    elif not follow_symlinks and entry.is_symlink() and entry.is_dir():
+                        continue
+                    else:
+                        stat = entry.stat()
+                        files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+                except OSError:
+                    pass
+        return {'mtime_ns': mtime_ns, 'files': files, 'subdirs': subdirs, 'names': names}
+
+    def save(self):
+        """ Saves the index to disk """
+        os.makedirs(os.path.dirname(self.fname), exist_ok=True)
+        with open(self.fname + '.tmp', 'w') as f:
+            json.dump({'root': self.root, 'version': __INDEX_VERSION__, 'dirs': self.dirs, 'runs': self.runs}, f)
+        os.replace(self.fname + '.tmp', self.fname)
+
+    def iter_files(self, *args, max_depth=None, **kwargs):
+        """
+        Yields (path, size, mtime_ns) for the files of the index, up to a folder depth max_depth (at most the depth
+            of the index), in the order of walk_folder_tree
+        """
+        if self.max_depth is not None:
+            max_depth = self.max_depth if max_depth is None else min(max_depth, self.max_depth)
+        if '' not in self.dirs:
+            return
+        # as in walk_folder_tree, a stack of (folder, depth, names iterator)
+        stack = [('', 0, iter(self.dirs['']['names']))]
+        while stack:
+            rel, depth, names = stack[-1]
+            entry = self.dirs[rel]
+            for name in names:
+                if name in entry['files']:
+                    size, mtime_ns = entry['files'][name]
+                    yield os.path.join(self.folder, rel, name), size, mtime_ns
+                elif (max_depth is None or depth < max_depth) and os.path.join(rel, name) in self.dirs:
+                    sub = os.path.join(rel, name)
+                    stack.append((sub, depth + 1, iter(self.dirs[sub]['names'])))
+                    break
+            else:
+                stack.pop()
+
+    def file_list(self, *args, include=[''], ext=[''], exclude=__exclude_key__, max_depth=None, **kwargs):
+        """ Lists files as make_recursive_file_list, from the index """
+        is_match = make_file_matcher(include=include, ext=ext, exclude=exclude)
+        return [path for path, size, mtime_ns in self.iter_files(max_depth=max_depth) if is_match(path)]
+
+    def run_list(self, part_fname, outro):
+        """ Makes the list of [number, name] of make_file_list for the root folder, from the index """
+        key = '%s\t%s' % (part_fname, outro)
+        entry = self.dirs.get('')
+        if entry is None:
+            return []
+        runs = self.runs.get(key)
+        if runs is None or runs['mtime_ns'] != entry['mtime_ns']:
+            runs = {'mtime_ns': entry['mtime_ns'], 'list': make_run_list(entry['names'], part_fname, outro)}
+            self.runs[key] = runs
+            self.save()
+        return [list(run) for run in runs['list']]
+
+
 # Important for analysis
 # makes a list of properties  from a config file of name file_name
 # properties are identified by keyword key
@@ -455,23 +978,116 @@ def make_prop_dict(fname, *args, key="set", name_offset=1, value_offset=2, **kwa
 
     """
 
-    lines = getlines(fname)
+    with open_file(fname, 'r') as f:
+        text = f.read()
+    return props_from_text(text, make_prop_matcher(key), *args, key=key, name_offset=name_offset,
+                           value_offset=value_offset, fname=fname, **kwargs)
+
+
+def make_prop_matcher(key):
+    """ A compiled expression finding the lines of a text that contain key """
+    return re.compile('^.*%s.*$' % re.escape(key), re.MULTILINE)
+
+
+def props_from_text(text, matcher, *args, key="set", name_offset=1, value_offset=2, fname='', **kwargs):
+    """ Makes the dictionary of properties of make_prop_dict from the text of a file, using matcher=make_prop_matcher(key) """
     props = {}
-    keys = key.split()
-    lines = [line for line in lines if line.find(key) >= 0]
-    for line in lines:
-        words = line.split()
-        ixes = [i for i, word in enumerate(words) if word.find(keys[-1]) >= 0]
+    last_key = key.split()[-1]
+    for match in matcher.finditer(text):
+        words = match.group().split()
+        ixes = [i for i, word in enumerate(words) if word.find(last_key) >= 0]
         for i in ixes:
             try:
                 props[words[i + name_offset]] = line_remove_comments(
                     clean_line_return(''.join(words[i + value_offset:]), *args, **kwargs), *args, **kwargs)
             except:
                 print('Could not understand property %s from configuration file %s' % (words[i], fname))
-    # for line in lines1:
     return props
 
 
+def read_prop_dict(fname, *args, **kwargs):
+    """ make_prop_dict for make_prop_table : returns the properties, file size and modification time, or an error """
+    try:
+        stat = os.stat(fname)
+        return make_prop_dict(fname, *args, **kwargs), stat.st_size, stat.st_mtime_ns, None
+    except Exception as error:
+        return None, -1, -1, '%s: %s' % (type(error).__name__, error)
+
+
+def make_prop_table(fnames, *args, key="set", name_offset=1, value_offset=2, props=None, workers=1, backend='thread',
+                    cache=False, cache_dir=None, **kwargs):
+    """
+    Reads properties (cf make_prop_dict) from many files, and makes a table of them
+    returns a dictionary of columns : {'fname' : fnames, PROPERTY_1 : [values], PROPERTY_2 : [values], ...}
+        with one value per file (None if the file does not have the property)
+    props : list of properties to keep (by default all properties found)
+    workers : number of threads (backend='thread') or processes (backend='process') reading files
+    cache : if True, properties are stored in cache_dir (by default ~/.cache/sio_tools/props),
+        and only read again from files whose size or modification time changed
+    """
+    options = {'key': key, 'name_offset': name_offset, 'value_offset': value_offset}
+    dicts = [None] * len(fnames)
+    todo = list(range(len(fnames)))
+
+    cached = {}
+    if cache:
+        if cache_dir is None:
+            cache_dir = os.path.join(os.environ.get('SIO_TOOLS_CACHE', __CACHE_DIR__), 'props')
+        cache_name = os.path.join(cache_dir, '%s.json' % hashlib.sha1(repr(sorted(options.items())).encode()).hexdigest())
+        try:
+            with open(cache_name, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+        todo = []
+        for n, fname in enumerate(fnames):
+            entry = cached.get(os.path.abspath(fname))
+            try:
+                stat = os.stat(fname)
+                if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                    dicts[n] = entry[2]
+                    continue
+            except OSError:
+                pass
+            todo.append(n)
+
+    if workers > 1 and len(todo) > 1:
+        if backend == 'process':
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=workers)
+        elif backend == 'thread':
+            executor = ThreadPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError('Unknown backend %s (should be process or thread)' % backend)
+        with executor:
+            results = list(executor.map(partial_call(read_prop_dict, **options), [fnames[n] for n in todo],
+                                        chunksize=64 if backend == 'process' else 1))
+    else:
+        results = [read_prop_dict(fnames[n], **options) for n in todo]
+
+    for n, (prop_dict, size, mtime_ns, error) in zip(todo, results):
+        if error is not None:
+            custom_warn('Could not read properties from %s (%s)' % (fnames[n], error))
+            continue
+        dicts[n] = prop_dict
+        if cache:
+            cached[os.path.abspath(fnames[n])] = [size, mtime_ns, prop_dict]
+
+    if cache and len(todo):
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_name + '.tmp', 'w') as f:
+            json.dump(cached, f)
+        os.replace(cache_name + '.tmp', cache_name)
+
+    if props is None:
+        # properties in order of appearance
+        props = list({prop: None for prop_dict in dicts if prop_dict is not None for prop in prop_dict})
+    table = {'fname': list(fnames)}
+    for prop in props:
+        table[prop] = [None if prop_dict is None else prop_dict.get(prop) for prop_dict in dicts]
+    return table
+
+
 # Check if word exist in lines
 def isword_lines(lines, word):
     for li in lines:
@@ -480,30 +1096,386 @@ def isword_lines(lines, word):
     return 0
 
 
+## Compressed files
+def file_compression(fname, mode='r'):
+    """
+    Compression of a file ('gzip', 'bz2' or 'xz'), or None if it is not compressed
+    A file to be read is recognized from its first bytes, a file to be written from its extension
+    """
+    if 'r' in mode:
+        try:
+            with open(fname, 'rb') as f:
+                start = f.read(6)
+            for compression, (magic, ext) in __COMPRESSIONS__.items():
+                if start.startswith(magic):
+                    return compression
+            return None
+        except OSError:
+            pass
+    for compression, (magic, ext) in __COMPRESSIONS__.items():
+        if fname.endswith(ext):
+            return compression
+    return None
+
+
+def open_file(fname, mode='r', **kwargs):
+    """
+    Opens a file as open() does, compressed files (cf file_compression) being decompressed or compressed on the fly
+    Compressed files are read and written as streams : they are never fully inflated in memory
+    """
+    compression = file_compression(fname, mode)
+    if compression is None:
+        return open(fname, mode, **kwargs)
+    kwargs.pop('buffering', None)
+    if 'b' not in mode and 't' not in mode:
+        mode = mode + 't'
+    if compression == 'gzip':
+        import gzip
+        # the level of the gzip command line tool : level 9 is much slower, for little gain
+        return gzip.open(fname, mode, compresslevel=6, **kwargs)
+    elif compression == 'bz2':
+        import bz2
+        return bz2.open(fname, mode, **kwargs)
+    else:
+        import lzma
+        return lzma.open(fname, mode, **kwargs)
+
+
+def uncompressed_name(fname):
+    """ The name of a file without the extension of its compression, e.g. run.txt for run.txt.gz """
+    for compression, (magic, ext) in __COMPRESSIONS__.items():
+        if fname.endswith(ext):
+            return fname[:-len(ext)]
+    return fname
+
+
+def pandas_compression(fname):
+    """ The compression of a file, as the compression argument of pandas readers """
+    compression = file_compression(fname)
+    return 'infer' if compression is None else compression
+
+
 # def get lines from file
 def getlines(fname):
-    f = open(fname, 'r')
-    lines = f.readlines()
-    f.close()
+    with open_file(fname, 'r') as f:
+        lines = f.readlines()
     return lines
 
 
 # decomposes a file into body and header
 def decompose_file(fname, *args, comments=__COMMENTS__, **kwargs):
-    lines = clean_lines(getlines(fname), *args, **kwargs)
+    is_comment = make_comment_matcher(comments)
     head_lines = []
     body_lines = []
+    with open_file(fname, 'r') as f:
+        for line in f:
+            if line.isspace():
+                continue
+            if is_comment(line):
+                head_lines.append(clean_line_return(line))
+            else:
+                body_lines.append(clean_line_return(line))
+    return body_lines, head_lines
 
-    for line in lines:
-        is_header = 0
-        for c in comments:
-            if line.find(c) >= 0:
-                head_lines.append(line)
-                is_header = 1
-        if not is_header:
-            body_lines.append(line)
 
-    return body_lines, head_lines
+def make_comment_matcher(comments=__COMMENTS__):
+    """ A function telling whether a line contains any of the comments (returns a match or None) """
+    return re.compile('|'.join(re.escape(c) for c in comments)).search
+
+
+def make_header_matcher(comments=__COMMENTS__, inline_comments=False):
+    """
+    A function telling whether a line is a header line (returns a match or None) : a line containing a comment,
+        or with inline_comments=True a line starting with a comment, as in getdata (numbers before a comment are kept)
+    """
+    if not inline_comments:
+        return make_comment_matcher(comments)
+    return re.compile(r'\s*(?:%s)' % '|'.join(re.escape(c) for c in comments)).match
+
+
+def iter_body_blocks(fname, *args, comments=__COMMENTS__, block_rows=__BLOCK_ROWS__, on_header=None,
+                     inline_comments=False, **kwargs):
+    """
+    Reads a text file in a single pass, yielding blocks of at most block_rows body lines
+    Lines containing a comment are header lines : they are passed to on_header(line) (if provided), not to the body
+    With inline_comments=True, only lines starting with a comment are header lines (cf make_header_matcher)
+    """
+    is_comment = make_header_matcher(comments, inline_comments)
+    body = []
+    with open_file(fname, 'r') as f:
+        for line in f:
+            if is_comment(line):
+                if on_header is not None:
+                    on_header(clean_line_return(line))
+            elif not line.isspace():
+                body.append(line)
+                if len(body) >= block_rows:
+                    yield body
+                    body = []
+    if len(body):
+        yield body
+
+
+def scan_text_file(fname, *args, comments=__COMMENTS__, block_rows=__BLOCK_ROWS__, usecols=None, on_columns=None,
+                   on_labels=None, ragged=False, inline_comments=False, **kwargs):
+    """
+    Reads numbers and header from a text file in a single pass, without keeping the file lines
+    As in decompose_file, lines containing a comment are header lines
+        (with inline_comments=True, only lines starting with a comment, as in getdata)
+    With usecols, only some columns are kept (cf iter_row_blocks) ; as in txt_import_wrapper, column labels come from
+        the last header line of the file, which is read first (cf read_header_lines), and are passed to
+        on_labels(labels) (if provided)
+    With ragged=True, rows can have different lengths (cf ragged_rows)
+    returns array, number of rows, number of columns, header lines
+    """
+    header = []
+
+    def get_labels():
+        labels = split_header(read_header_lines(fname, comments=comments, inline_comments=inline_comments))
+        if on_labels is not None:
+            on_labels(labels)
+        return labels
+
+    line_blocks = iter_body_blocks(fname, comments=comments, block_rows=block_rows, on_header=header.append,
+                                   inline_comments=inline_comments)
+    if ragged:
+        ar = ragged_rows(line_blocks, comments=comments, usecols=usecols, get_labels=get_labels,
+                         on_columns=on_columns, **kwargs)
+        if ar is None:
+            raise ValueError('No numeric data found in file %s' % fname)
+        return ar, ar.shape[0], ar.shape[1], header
+    blocks = list(iter_row_blocks(line_blocks, comments=comments, usecols=usecols, get_labels=get_labels,
+                                  on_columns=on_columns))
+    if not len(blocks):
+        raise ValueError('No numeric data found in file %s' % fname)
+    ar = concatenate(blocks) if len(blocks) > 1 else blocks[0]
+    return ar, ar.shape[0], ar.shape[1], header
+
+
+def read_header_lines(fname, *args, comments=__COMMENTS__, inline_comments=False, chunk_bytes=2 ** 24, **kwargs):
+    """
+    The header lines of a text file (cf iter_body_blocks), without parsing its numbers
+    The file is read by chunks of chunk_bytes bytes, in which comments are searched for (cf find_header_lines)
+    """
+    header = []
+    rest = b''
+    with open_file(fname, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not len(chunk):
+                break
+            data = rest + chunk
+            # the last line may continue in the next chunk
+            end = data.rfind(b'\n') + 1
+            head_lines, head_starts = find_header_lines(data, comments=comments, inline_comments=inline_comments)
+            header += [line for line, start in zip(head_lines, head_starts) if start < end]
+            rest = data[end:]
+    header += find_header_lines(rest, comments=comments, inline_comments=inline_comments)[0]
+    return [line.rstrip('\r') for line in header]
+
+
+def find_header_lines(data, *args, comments=__COMMENTS__, inline_comments=False, **kwargs):
+    """
+    The header lines in bytes data : lines containing a comment (with inline_comments=True, starting with a comment)
+    returns the header lines, and their start in data
+    """
+    head_starts = set()
+    for comment in comments:
+        comment = comment.encode()
+        position = data.find(comment)
+        while position >= 0:
+            line_start = data.rfind(b'\n', 0, position) + 1
+            if not inline_comments or data[line_start:position].isspace() or line_start == position:
+                head_starts.add(line_start)
+            position = data.find(b'\n', position)
+            position = data.find(comment, position) if position >= 0 else -1
+    head_starts = sorted(head_starts)
+    head_lines = []
+    for head_start in head_starts:
+        head_stop = data.find(b'\n', head_start)
+        head_lines.append(data[head_start:head_stop if head_stop >= 0 else len(data)].decode())
+    return head_lines, head_starts
+
+
+def scan_text_file_parallel(fname, *args, workers=None, comments=__COMMENTS__, block_rows=__BLOCK_ROWS__,
+                            usecols=None, on_columns=None, on_labels=None, inline_comments=False, range_bytes=2 ** 26,
+                            shared_dir=None, **kwargs):
+    """
+    Reads numbers and header from a large text file with a pool of workers processes, as scan_text_file does
+        (with the same header lines and column labels)
+    The file is split into byte ranges aligned on lines, of about range_bytes bytes ; rows and header lines of each
+        range are first counted, then each range is parsed and written directly at its place in a shared array
+    The shared array is a file mapped in memory, in shared_dir (by default /dev/shm if it exists, else the temporary
+        folder), which is removed once the array is filled : the returned array is this memory map
+    Small or compressed files are read by scan_text_file
+    returns array, number of rows, number of columns, header lines
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    size = os.path.getsize(fname)
+    n_ranges = min(4 * workers, size // range_bytes + 1)
+    if workers < 2 or n_ranges < 2 or file_compression(fname) is not None:
+        return scan_text_file(fname, comments=comments, block_rows=block_rows, usecols=usecols, on_columns=on_columns,
+                              on_labels=on_labels, inline_comments=inline_comments, **kwargs)
+    from concurrent.futures import ProcessPoolExecutor
+    import tempfile
+    ranges = line_aligned_ranges(fname, n_ranges)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        counts = list(executor.map(partial_call(count_byte_range, fname, comments=comments,
+                                                inline_comments=inline_comments), ranges))
+        starts = [0]
+        for count in counts:
+            starts.append(starts[-1] + count[0])
+        header = []
+        nc = -1
+        for (rows, head_lines, length) in counts:
+            header += head_lines
+            if nc < 0:
+                nc = length
+        if nc < 0:
+            raise ValueError('No numeric data found in file %s' % fname)
+        columns = None
+        if usecols is not None:
+            # as in scan_text_file, labels come from the last header line
+            labels = split_header(header)
+            if on_labels is not None:
+                on_labels(labels)
+            columns = resolve_usecols(usecols, labels, nc)
+            if on_columns is not None:
+                on_columns(columns, nc)
+        shape = (starts[-1], nc if columns is None else len(columns))
+
+        if shared_dir is None:
+            shared_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        handle, path = tempfile.mkstemp(dir=shared_dir, prefix='sio_tools_', suffix='.bin')
+        os.close(handle)
+        try:
+            ar = memmap(path, dtype=float, mode='w+', shape=shape)
+            futures = [executor.submit(parse_byte_range, fname, byte_range, path, shape, start, nc,
+                                       columns=columns, comments=comments, inline_comments=inline_comments,
+                                       block_rows=block_rows)
+                       for byte_range, start in zip(ranges, starts)]
+            written = [future.result() for future in futures]
+        finally:
+            # the memory map stays valid once the file is removed
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    if written != [count[0] for count in counts]:
+        # some lines contained no number : the rows of each range are packed together
+        ar = concatenate([ar[start:start + n] for start, n in zip(starts, written)])
+    return ar, ar.shape[0], ar.shape[1], header
+
+
+def line_aligned_ranges(fname, n_ranges):
+    """ Splits a file into n_ranges ranges of bytes (start, stop) of about the same size, starting at lines """
+    size = os.path.getsize(fname)
+    bounds = [0]
+    with open(fname, 'rb') as f:
+        for k in range(1, n_ranges):
+            f.seek(max(size * k // n_ranges - 1, bounds[-1]))
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def read_byte_range(fname, byte_range):
+    """ The bytes of a range (start, stop) of a file, with windows line returns replaced by \\n """
+    start, stop = byte_range
+    with open(fname, 'rb') as f:
+        f.seek(start)
+        return f.read(stop - start).replace(b'\r\n', b'\n')
+
+
+def count_byte_range(fname, byte_range, *args, comments=__COMMENTS__, inline_comments=False, **kwargs):
+    """
+    Counts the lines of numbers in a byte range of a text file (cf scan_text_file_parallel)
+    Header lines are the lines containing a comment (with inline_comments=True, starting with a comment),
+        as in scan_text_file
+    returns the number of lines of numbers, header lines, and the number of values in the first row of numbers
+        (-1 if there is none)
+    Lines without numbers are counted as rows : they are removed once parsed (cf parse_byte_range)
+    """
+    data = read_byte_range(fname, byte_range)
+    head_lines, head_starts = find_header_lines(data, comments=comments, inline_comments=inline_comments)
+    blanks = len(re.findall(rb'\n[ \t\r\f\v]*(?=\n)', b'\n' + data + b'\n'))
+    rows = data.count(b'\n') + 1 - blanks - len(head_lines)
+    # the first line with numbers
+    is_comment = make_header_matcher(comments, inline_comments)
+    length = -1
+    start = 0
+    while rows > 0 and start < len(data):
+        stop = data.find(b'\n', start)
+        stop = len(data) if stop < 0 else stop
+        line = data[start:stop].decode()
+        if not is_comment(line) and len(line) and not line.isspace():
+            length = first_row_length([line], comments=comments)
+            if length >= 0:
+                break
+        start = stop + 1
+    return rows, head_lines, length
+
+
+def parse_byte_range(fname, byte_range, path, shape, start, nc, *args, columns=None, comments=__COMMENTS__,
+                     inline_comments=False, block_rows=__BLOCK_ROWS__, **kwargs):
+    """
+    Parses the lines of numbers of a byte range of a text file into rows of the shared array in file path,
+        from row start (cf scan_text_file_parallel) ; returns the number of rows written
+    """
+    is_comment = make_header_matcher(comments, inline_comments)
+    body = [line for line in read_byte_range(fname, byte_range).decode().split('\n')
+            if not is_comment(line) and len(line) and not line.isspace()]
+    ar = memmap(path, dtype=float, mode='r+', shape=shape)
+    n = start
+    for first in range(0, len(body), block_rows):
+        rows = parse_rows(body[first:first + block_rows], nc, comments=comments, usecols=columns)
+        ar[n:n + len(rows)] = rows
+        n += len(rows)
+    ar.flush()
+    return n - start
+
+
+def iter_data_chunks(fname, *args, chunk_rows=__BLOCK_ROWS__, comments=__COMMENTS__, usecols=None, **kwargs):
+    """
+    Reads a file by chunks of at most chunk_rows rows, with bounded memory
+    yields (array, labels) for each chunk
+    As in decompose_file, lines containing a comment are header lines, and labels come from the last header line read
+    The number of columns is set by the first row of the file, shorter rows are zero-filled
+    With usecols, only some columns are kept (cf resolve_usecols)
+    .csv files are read through pandas (cf iter_csv_chunks)
+    """
+    if uncompressed_name(fname).endswith('.csv'):
+        yield from iter_csv_chunks(fname, *args, chunk_rows=chunk_rows, usecols=usecols, **kwargs)
+        return
+
+    header = []
+    selection = [None, 0]
+
+    def on_header(line):
+        header[:] = [line]
+
+    def on_columns(columns, ncols):
+        selection[:] = [columns, ncols]
+
+    for rows in iter_row_blocks(iter_body_blocks(fname, comments=comments, block_rows=chunk_rows, on_header=on_header),
+                                comments=comments, usecols=usecols, get_labels=lambda: split_header(header),
+                                on_columns=on_columns):
+        yield rows, select_labels(split_header(header), *selection)
+
+
+def iter_csv_chunks(fname, *args, chunk_rows=__BLOCK_ROWS__, usecols=None, **kwargs):
+    """ Reads a csv file by chunks of chunk_rows rows through pandas, yields (array, labels) for each chunk """
+    pd = import_pandas()
+    for frames in pd.read_csv(fname, *args, chunksize=chunk_rows, usecols=csv_usecols(fname, usecols),
+                              compression=pandas_compression(fname), **kwargs):
+        out = import_array_from_frames(frames)
+        yield out['data'], out['labels']
 
 
 def get_data_and_header(fname, *args, **kwargs):
@@ -544,39 +1516,323 @@ def split_header(heads, *args, spliter=' ', **kwargs):
         return []
 
 
-def data_import_wrapper(fname, *args, **kwargs):
-    if fname.endswith('.txt'):
-        return txt_import_wrapper(fname, *args, **kwargs)
-    elif fname.endswith('.csv'):
+def data_import_wrapper(fname, *args, cache=False, cache_dir=None, cache_size=__CACHE_MAX_BYTES__, keep_lines=True,
+                        **kwargs):
+    """
+    Imports data from a file, choosing the reader from the file extension
+    Compressed files (.gz, .bz2, .xz) are decompressed on the fly, e.g. run.txt.gz is read as a text file
+    .npy files are memory-mapped rather than read (cf npy_import_wrapper), .parquet and .feather files need pyarrow
+    With cache=True, the parsed array and labels are stored in a cache folder (cache_dir, by default ~/.cache/sio_tools),
+        and later imports of the unchanged file memory-map the cached array instead of parsing the file
+        The cache is kept under cache_size bytes by removing the least recently used entries
+        Imports through the cache never contain the body and header lines, whether the file was cached or not
+        Imports with a function as option (e.g. usecols) are not cached
+    With keep_lines=False, the body and header lines of text files are not kept, which is faster
+    """
+    if cache and not any(callable(option) for option in list(args) + list(kwargs.values())):
+        if cache_dir is None:
+            cache_dir = os.environ.get('SIO_TOOLS_CACHE', __CACHE_DIR__)
+        out = cache_load(fname, *args, cache_dir=cache_dir, **kwargs)
+        if out is None:
+            out = data_import_wrapper(fname, *args, keep_lines=False, **kwargs)
+            cache_store(fname, out, *args, cache_dir=cache_dir, cache_size=cache_size, **kwargs)
+        return out
+
+    name = uncompressed_name(fname)
+    if name.endswith('.txt'):
+        return txt_import_wrapper(fname, *args, keep_lines=keep_lines, **kwargs)
+    elif name.endswith('.csv'):
         return csv_import_wrapper(fname, *args, **kwargs)
-    elif fname.endswith('.xls') or fname.endswith('.xlsx'):
+    elif name.endswith('.xls') or name.endswith('.xlsx'):
         return xls_import_wrapper(fname, *args, **kwargs)
+    elif name.endswith('.npy') or name.endswith('.npz'):
+        return npy_import_wrapper(fname, *args, **kwargs)
+    elif name.endswith('.parquet') or name.endswith('.feather'):
+        return arrow_import_wrapper(fname, *args, **kwargs)
     else:
         try:
-            return txt_import_wrapper(fname, *args, **kwargs)
+            return txt_import_wrapper(fname, *args, keep_lines=keep_lines, **kwargs)
         except:
             raise ValueError('Unsupported format for file %s' % fname)
             return empty_out_data()
 
 
-def txt_import_wrapper(fname, *args, **kwargs):
+## Loading many files at once
+def load_many(fnames, *args, workers=None, backend='process', keep_lines=False, **kwargs):
+    """
+    Imports many files in parallel with data_import_wrapper, using workers processes (backend='process') or threads
+    returns a list of outputs in the same order as fnames
+    A file that cannot be read does not stop the others : its output is empty, with the reason in output['error']
+    With the process backend, arrays are sent back through shared memory rather than pickled
+    Body and header lines are only kept if keep_lines=True
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if backend == 'process':
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+        job = load_into_shared_memory
+    elif backend == 'thread':
+        executor = ThreadPoolExecutor(max_workers=workers)
+        job = load_for_many
+    else:
+        raise ValueError('Unknown backend %s (should be process or thread)' % backend)
+
+    outs = []
+    with executor:
+        futures = [executor.submit(job, fname, *args, keep_lines=keep_lines, **kwargs) for fname in fnames]
+        for fname, future in zip(fnames, futures):
+            try:
+                out = future.result()
+                if backend == 'process':
+                    out = read_from_shared_memory(out)
+            except Exception as error:
+                out = empty_out_data()
+                out['error'] = '%s: %s' % (type(error).__name__, error)
+            if out['error'] is not None:
+                custom_warn('Could not load %s (%s)' % (fname, out['error']))
+            out['fname'] = fname
+            outs.append(out)
+    return outs
+
+
+def load_for_many(fname, *args, keep_lines=False, **kwargs):
+    """ Imports a single file for load_many, storing errors rather than raising them """
+    try:
+        out = data_import_wrapper(fname, *args, keep_lines=keep_lines, **kwargs)
+        out['error'] = None
+    except Exception as error:
+        out = empty_out_data()
+        out['error'] = '%s: %s' % (type(error).__name__, error)
+    if not keep_lines:
+        out['body'] = []
+        out['header'] = []
+    return out
+
+
+def load_into_shared_memory(fname, *args, **kwargs):
+    """ Imports a single file in a worker process for load_many, moving the numeric array to shared memory """
+    from multiprocessing import shared_memory, resource_tracker
+    out = load_for_many(fname, *args, **kwargs)
+    data = asarray(out['data'])
+    if out['error'] is None and not data.dtype.hasobject and data.nbytes > 0:
+        shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+        ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[...] = data
+        out['data'] = (shm.name, data.shape, data.dtype.str)
+        out['shared'] = True
+        # the parent process reads then unlinks the memory, so the worker must not clean it up when exiting
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        shm.close()
+    return out
+
+
+def read_from_shared_memory(out):
+    """ Copies back to an array the data that load_into_shared_memory placed in shared memory, and frees it """
+    from multiprocessing import shared_memory
+    if out.pop('shared', False):
+        name, shape, dtype_str = out['data']
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            out['data'] = ndarray(shape, dtype=dtype(dtype_str), buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+    return out
+
+
+## Cache of imported data
+def cache_key(fname, *args, **kwargs):
+    """ A key identifying a file (path, size, modification time) and the options used to import it """
+    stat = os.stat(fname)
+    options = repr((args, sorted(kwargs.items())))
+    ingredients = "%s|%s|%s|%s" % (os.path.abspath(fname), stat.st_size, stat.st_mtime_ns, options)
+    return hashlib.sha1(ingredients.encode()).hexdigest()
+
+
+def cache_load(fname, *args, cache_dir=__CACHE_DIR__, **kwargs):
+    """ Loads imported data from the cache, memory-mapping the array ; returns None if not cached """
+    path = os.path.join(cache_dir, cache_key(fname, *args, **kwargs))
+    try:
+        data = load(path + '.npy', mmap_mode='r')
+        with open(path + '.json', 'r') as f:
+            saved = json.load(f)
+        labels = saved['labels']
+        columns = saved['columns']
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+    # marks the entry as recently used
+    os.utime(path + '.npy')
+    sx, sy = data.shape if data.ndim > 1 else (data.shape[0], 1)
+    return {'data': data, 'labels': labels, 'size_x': sx, 'size_y': sy, 'body': [], 'header': [], 'columns': columns}
+
+
+def cache_store(fname, out, *args, cache_dir=__CACHE_DIR__, cache_size=__CACHE_MAX_BYTES__, **kwargs):
+    """ Stores imported data in the cache, then trims the cache to cache_size bytes """
+    data = asarray(out['data'])
+    if data.dtype.hasobject:
+        custom_warn('Cannot cache non-numeric data from %s' % fname)
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, cache_key(fname, *args, **kwargs))
+    # Writing to temporary files first so that concurrent readers never see partial entries
+    with open(path + '.json.tmp', 'w') as f:
+        json.dump({'labels': [None if label is None else str(label) for label in out['labels']],
+                   'columns': out.get('columns')}, f)
+    with open(path + '.npy.tmp', 'wb') as f:
+        save(f, data)
+    os.replace(path + '.json.tmp', path + '.json')
+    os.replace(path + '.npy.tmp', path + '.npy')
+    cache_evict(cache_dir, cache_size)
+
+
+def cache_evict(cache_dir=__CACHE_DIR__, cache_size=__CACHE_MAX_BYTES__):
+    """ Removes least recently used cache entries until the cache is smaller than cache_size bytes """
+    entries = []
+    total = 0
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.npy'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path[:-4]))
+                total += stat.st_size
+    entries.sort()
+    for used, size, path in entries:
+        if total <= cache_size:
+            break
+        for ext in ['.npy', '.json']:
+            try:
+                os.remove(path + ext)
+            except OSError:
+                pass
+        total -= size
+
+
+def txt_import_wrapper(fname, *args, keep_lines=True, usecols=None, workers=None, **kwargs):
+    """
+    Imports a text file of space separated values, with a header in commented lines
+    With keep_lines=False, the file is parsed in a single pass and body and header lines are not returned
+    With usecols, only some columns are parsed and kept (cf resolve_usecols) ;
+        out['columns'] is the list of indices of the kept columns in the file (None if all columns are kept)
+    With ragged=True, the number of columns is set by the longest row, and missing values are nan (or fill_value)
+    With keep_lines=False and workers > 1, a large file is parsed in parallel by workers processes
+        (cf scan_text_file_parallel)
+    """
+    selection = [None, 0]
+    resolved = []
+
+    def on_columns(columns, ncols):
+        selection[:] = [columns, ncols]
+
+    if not keep_lines and kwargs.get('engine', 'numpy') == 'numpy':
+        if workers is not None and workers > 1 and not kwargs.get('ragged', False):
+            (data, sx, sy, head_lines) = scan_text_file_parallel(fname, workers=workers, usecols=usecols,
+                                                                 on_columns=on_columns, on_labels=resolved.append,
+                                                                 **kwargs)
+        else:
+            (data, sx, sy, head_lines) = scan_text_file(fname, usecols=usecols, on_columns=on_columns,
+                                                        on_labels=resolved.append, **kwargs)
+        # the labels the columns were selected from
+        labels = resolved[0] if len(resolved) else split_header(head_lines)
+        return {'data': data, 'labels': select_labels(labels, *selection), 'size_x': sx,
+                'size_y': sy, 'body': [], 'header': [], 'columns': selection[0]}
     (body_lines, head_lines) = decompose_file(fname, **kwargs)
-    (data, sx, sy) = getdata_lines(body_lines, **kwargs)
-    return {'data': data, 'labels': split_header(head_lines), 'size_x': sx, 'size_y': sy, 'body': body_lines,
-            'header': head_lines}
+    labels = split_header(head_lines)
+    (data, sx, sy) = getdata_lines(body_lines, usecols=usecols, get_labels=lambda: labels, on_columns=on_columns,
+                                   **kwargs)
+    return {'data': data, 'labels': select_labels(labels, *selection), 'size_x': sx, 'size_y': sy,
+            'body': body_lines, 'header': head_lines, 'columns': selection[0]}
 
 
-def csv_import_wrapper(fname, *args, **kwargs):
-    frames = pd.read_csv(fname)
-    return import_array_from_frames(frames)
+def csv_import_wrapper(fname, *args, chunk_rows=None, usecols=None, **kwargs):
+    """
+    Imports a csv file ; if chunk_rows is given, returns a generator of (array, labels) chunks instead
+    With usecols, only some columns are parsed and kept (cf resolve_usecols)
+    """
+    if chunk_rows:
+        return iter_csv_chunks(fname, chunk_rows=chunk_rows, usecols=usecols)
+    pd = import_pandas()
+    columns = csv_usecols(fname, usecols)
+    frames = pd.read_csv(fname, usecols=columns, compression=pandas_compression(fname))
+    out = import_array_from_frames(frames)
+    out['columns'] = columns
+    return out
 
 
-def xls_import_wrapper(fname, *args, **kwargs):
+def csv_usecols(fname, usecols):
+    """ Indices of the columns of a csv file to keep (cf resolve_usecols), from the labels of its first line """
+    if usecols is None:
+        return None
+    pd = import_pandas()
+    labels = [label for label in pd.read_csv(fname, nrows=0, compression=pandas_compression(fname)).columns.values]
+    return resolve_usecols(usecols, labels, len(labels))
+
+
+def xls_import_wrapper(fname, *args, usecols=None, **kwargs):
+    """ Imports an excel file (usecols is not supported : all columns are kept) """
     custom_warn('Excel support very limited')
+    pd = import_pandas()
     frames = pd.read_excel(fname, *args, **kwargs)
     return import_array_from_frames(frames)
 
 
+def npy_import_wrapper(fname, *args, mmap=True, **kwargs):
+    """
+    Imports an array from a .npy or .npz file, without labels unless the .npz file contains an array 'labels'
+    .npy files are memory-mapped (unless mmap=False or the file is compressed) : values are read from disk when used
+    usecols is ignored : all columns are imported
+    From a .npz file, the array 'data' is imported, or else the first array ;
+        a compressed .npz file (e.g. run.npz.gz) is decompressed in memory first
+    """
+    labels = []
+    if uncompressed_name(fname).endswith('.npz'):
+        source = fname
+        if file_compression(fname) is not None:
+            # numpy reads .npz files as zip archives, which need to seek in the file
+            with open_file(fname, 'rb') as f:
+                source = io.BytesIO(f.read())
+        with load(source) as arrays:
+            names = [name for name in arrays.files if name != 'labels']
+            if not len(names):
+                raise ValueError('No array found in %s' % fname)
+            data = arrays['data' if 'data' in names else names[0]]
+            if 'labels' in arrays.files:
+                labels = [str(label) for label in arrays['labels']]
+    elif file_compression(fname) is not None:
+        with open_file(fname, 'rb') as f:
+            data = load(f)
+    else:
+        data = load(fname, mmap_mode='r' if mmap else None)
+    if data.ndim == 1:
+        data = data.reshape((data.shape[0], 1))
+    elif not data.ndim == 2:
+        raise ValueError('Cannot import array of shape %s from %s' % (data.shape, fname))
+    sx, sy = data.shape
+    return {'data': data, 'labels': labels, 'size_x': sx, 'size_y': sy, 'body': [], 'header': [], 'columns': None}
+
+
+def arrow_import_wrapper(fname, *args, usecols=None, **kwargs):
+    """
+    Imports a parquet or feather file through pyarrow, with the column names as labels
+    Columns are copied into a single array ; with usecols, only some columns are read (cf resolve_usecols)
+    """
+    pa = import_pyarrow()
+    if uncompressed_name(fname).endswith('.parquet'):
+        labels = pa.parquet.read_schema(fname).names
+        columns = resolve_usecols(usecols, labels, len(labels))
+        table = pa.parquet.read_table(fname, columns=None if columns is None else [labels[c] for c in columns],
+                                      memory_map=True)
+    else:
+        table = pa.feather.read_table(fname, memory_map=True)
+        labels = table.column_names
+        columns = resolve_usecols(usecols, labels, len(labels))
+        if columns is not None:
+            table = table.select(columns)
+    data = stack([column.to_numpy() for column in table.columns], axis=1)
+    sx, sy = data.shape
+    return {'data': data, 'labels': table.column_names, 'size_x': sx, 'size_y': sy, 'body': [], 'header': [],
+            'columns': columns}
+
+
 def import_array_from_frames(frames):
     cols = frames.columns.values
     labels = [word for word in cols]
@@ -585,8 +1841,323 @@ def import_array_from_frames(frames):
     return {'data': data, 'labels': labels, 'size_x': sx, 'size_y': sy, 'body': [], 'header': []}
 
 
+## Following files that are being written
+class FileFollower:
+    """
+    An incremental reader of a text or csv file that is being appended to, e.g. the report of a running simulation
+    Each read() only parses the lines appended since the previous read, and returns them as an array of rows ;
+        the byte offset of the data already read, and the last line if it is not complete yet, are kept between reads
+    If the file becomes shorter (e.g. it was written again), it is read again from the start
+    As in txt_import_wrapper, lines of text files containing a comment are header lines,
+        the number of columns is set by the first row, and labels come from the last header line
+    With usecols, only some columns are kept (cf resolve_usecols)
+    """
+    def __init__(self, fname, *args, comments=__COMMENTS__, usecols=None, **kwargs):
+        if file_compression(fname) is not None:
+            raise ValueError('Cannot follow compressed file %s' % fname)
+        self.fname = fname
+        self.comments = comments
+        self.usecols = usecols
+        self.is_csv = fname.endswith('.csv')
+        self.is_comment = make_comment_matcher(comments)
+        self.reset()
+
+    def reset(self):
+        """ Forgets what was read : the next read starts from the beginning of the file """
+        self.offset = 0
+        self.partial = b''
+        self.header = []
+        self.nc = -1
+        self.columns = None
+        self.buffer = None
+        self.n_rows = 0
+
+    def read(self):
+        """ Parses the complete lines appended to the file since the last read, returns them as an array of rows """
+        if os.path.getsize(self.fname) < self.offset:
+            custom_warn('%s became shorter : reading it again' % self.fname)
+            self.reset()
+        with open(self.fname, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        self.offset += len(chunk)
+        chunk = self.partial + chunk
+        end = chunk.rfind(b'\n') + 1
+        self.partial = chunk[end:]
+        lines = chunk[:end].decode().splitlines(keepends=True)
+        if self.is_csv:
+            rows = self.parse_csv(lines)
+        else:
+            rows = self.parse_text(lines)
+        self.append_rows(rows)
+        return rows
+
+    def follow(self, interval=1.0, timeout=None):
+        """
+        Yields the rows appended to the file, checking for new data every interval seconds,
+            until no data was appended for timeout seconds (never stops if timeout is None)
+        """
+        last = time.time()
+        while True:
+            rows = self.read()
+            if len(rows):
+                last = time.time()
+                yield rows
+            elif timeout is not None and time.time() - last > timeout:
+                return
+            else:
+                time.sleep(interval)
+
+    def parse_text(self, lines):
+        body = []
+        for line in lines:
+            if self.is_comment(line):
+                self.header = [clean_line_return(line)]
+            elif not line.isspace():
+                body.append(line)
+        if self.nc < 0:
+            self.nc = first_row_length(body, comments=self.comments)
+            if self.nc < 0:
+                return zeros((0, 0))
+            if self.usecols is not None:
+                self.columns = resolve_usecols(self.usecols, split_header(self.header), self.nc)
+        return parse_rows(body, self.nc, comments=self.comments, usecols=self.columns)
+
+    def parse_csv(self, lines):
+        pd = import_pandas()
+        if not len(self.header):
+            if not len(lines):
+                return zeros((0, 0))
+            self.header = [lines.pop(0)]
+            labels = [label for label in pd.read_csv(io.StringIO(self.header[0]), nrows=0).columns.values]
+            self.nc = len(labels)
+            self.columns = resolve_usecols(self.usecols, labels, self.nc)
+        if not len(lines):
+            return zeros((0, self.width()))
+        # the first line of the file is parsed again, for pandas to name the columns as for the whole file
+        frames = pd.read_csv(io.StringIO(self.header[0] + ''.join(lines)), usecols=self.columns)
+        return frames.to_numpy()
+
+    def width(self):
+        """ The number of columns of the rows returned """
+        if self.columns is not None:
+            return len(self.columns)
+        return max(self.nc, 0)
+
+    def append_rows(self, rows):
+        """ Adds rows to the buffer of all rows, which grows geometrically """
+        if not len(rows):
+            return
+        n = self.n_rows + len(rows)
+        if self.buffer is None or n > len(self.buffer) or rows.dtype != self.buffer.dtype:
+            buffer = zeros((max(2 * n, 1024),) + rows.shape[1:], dtype=rows.dtype if self.buffer is None
+                           else promote_types(self.buffer.dtype, rows.dtype))
+            if self.buffer is not None:
+                buffer[:self.n_rows] = self.buffer[:self.n_rows]
+            self.buffer = buffer
+        self.buffer[self.n_rows:n] = rows
+        self.n_rows = n
+
+    def array(self):
+        """ All the rows read so far """
+        if self.buffer is None:
+            return zeros((0, self.width()))
+        return self.buffer[:self.n_rows]
+
+    def labels(self):
+        """ Labels of the columns """
+        if self.is_csv:
+            if not len(self.header):
+                return []
+            labels = [label for label in import_pandas().read_csv(io.StringIO(self.header[0]), nrows=0).columns.values]
+        else:
+            labels = split_header(self.header)
+        return select_labels(labels, self.columns, self.nc)
+
+    def out_data(self):
+        """ The rows read so far, in the output format of data_import_wrapper """
+        data = self.array()
+        sx, sy = data.shape
+        return {'data': data, 'labels': self.labels(), 'size_x': sx, 'size_y': sy, 'body': [], 'header': self.header,
+                'columns': self.columns}
+
+
+## Files of many frames
+class FrameIndex:
+    """
+    An index of the frames of a text file, to read any frame without parsing the whole file
+    A frame starts with a line beginning with a comment followed by marker, e.g. "% frame 123"
+    The file is scanned once, recording the byte offset of each frame, and the index is saved beside the file
+        (index_fname, by default FNAME.frames.json) ; when the file grows, only the appended data is scanned
+    Labels come from the last header line of a frame (other than the marker), or else from the header before frames
+    index[i] is read_frame(i), index[i:j] a list of frames
+    """
+    def __init__(self, fname, *args, marker='frame', comments=__COMMENTS__, index_fname=None, refresh=True,
+                 **kwargs):
+        if file_compression(fname) is not None:
+            raise ValueError('Cannot index the frames of compressed file %s' % fname)
+        self.fname = fname
+        self.marker = marker
+        self.comments = list(comments)
+        if index_fname is None:
+            index_fname = fname + '.frames.json'
+        self.index_fname = index_fname
+        self.clear()
+        try:
+            with open(self.index_fname, 'r') as f:
+                saved = json.load(f)
+            if saved['marker'] == self.marker and saved['comments'] == self.comments:
+                for key in ['size', 'mtime_ns', 'scanned', 'offsets', 'markers', 'preamble']:
+                    setattr(self, key, saved[key])
+        except (OSError, ValueError, KeyError):
+            self.clear()
+        if refresh:
+            self.refresh()
+
+    def clear(self):
+        self.size = -1
+        self.mtime_ns = -1
+        # bytes of the file already scanned, up to the end of a line
+        self.scanned = 0
+        self.offsets = []
+        self.markers = []
+        self.preamble = []
+
+    def refresh(self):
+        """ Updates the index if the file changed : data appended to the file is scanned, else the whole file """
+        stat = os.stat(self.fname)
+        if stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns:
+            return self
+        if stat.st_size < self.scanned or not self.last_marker_unchanged():
+            self.clear()
+        self.scan()
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.save()
+        return self
+
+    def last_marker_unchanged(self):
+        """ Checks that the last frame marker is still in place, i.e. that the file was appended to, not rewritten """
+        if not len(self.offsets):
+            return True
+        marker = self.markers[-1].encode()
+        with open(self.fname, 'rb') as f:
+            f.seek(self.offsets[-1])
+            return f.read(len(marker)) == marker
+
+    def scan(self, chunk_bytes=2 ** 24):
+        """ Records the offsets of the frame markers in the part of the file not scanned yet, by chunks of bytes """
+        comments = b'|'.join(re.escape(c.encode()) for c in self.comments)
+        # "% frames" is not a frame marker
+        boundary = rb'(?!\w)' if re.match(r'\w', self.marker[-1:]) else b''
+        is_marker = re.compile(rb'^[ \t]*(?:%s)[ \t]*%s%s[^\n]*' % (comments, re.escape(self.marker.encode()), boundary),
+                               re.MULTILINE)
+        is_header = re.compile(rb'^[^\n]*(?:%s)[^\n]*' % comments, re.MULTILINE)
+        start = self.scanned
+        pending = b''
+        with open(self.fname, 'rb') as f:
+            f.seek(start)
+            while True:
+                chunk = f.read(chunk_bytes)
+                if not len(chunk):
+                    break
+                pending += chunk
+                end = pending.rfind(b'\n') + 1
+                lines = pending[:end]
+                pending = pending[end:]
+                before_frames = not len(self.offsets)
+                for match in is_marker.finditer(lines):
+                    self.offsets.append(start + match.start())
+                    self.markers.append(match.group().decode().rstrip('\r'))
+                if before_frames:
+                    # the last header line before the first frame
+                    first = self.offsets[0] - start if len(self.offsets) else len(lines)
+                    headers = is_header.findall(lines, 0, first)
+                    if len(headers):
+                        self.preamble = [clean_line_return(headers[-1].decode())]
+                start += end
+        self.scanned = start
+
+    def save(self):
+        """ Saves the index beside the file (or to index_fname) """
+        saved = {'marker': self.marker, 'comments': self.comments, 'size': self.size, 'mtime_ns': self.mtime_ns,
+                 'scanned': self.scanned, 'offsets': self.offsets, 'markers': self.markers, 'preamble': self.preamble}
+        try:
+            with open(self.index_fname + '.tmp', 'w') as f:
+                json.dump(saved, f)
+            os.replace(self.index_fname + '.tmp', self.index_fname)
+        except OSError as error:
+            custom_warn('Could not save frame index %s (%s)' % (self.index_fname, error))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.read_frame(j) for j in range(*i.indices(len(self.offsets)))]
+        return self.read_frame(i)
+
+    def read_frame(self, i, *args, **kwargs):
+        """
+        Reads frame i (negative indices count from the end) by seeking to it
+        returns a dict as txt_import_wrapper, with the marker line in out['frame'] ;
+            options (usecols, ragged, ...) are passed to getdata_lines
+        """
+        n = len(self.offsets)
+        if i < 0:
+            i = i + n
+        if not 0 <= i < n:
+            raise IndexError('Frame %s out of range : %s has %s frames' % (i, self.fname, n))
+        with open(self.fname, 'rb') as f:
+            f.seek(self.offsets[i])
+            if i + 1 < n:
+                text = f.read(self.offsets[i + 1] - self.offsets[i])
+            else:
+                text = f.read()
+        is_comment = make_comment_matcher(self.comments)
+        head_lines = []
+        body_lines = []
+        for line in text.decode().splitlines()[1:]:
+            if is_comment(line):
+                head_lines.append(line)
+            elif not line.isspace() and len(line):
+                body_lines.append(line)
+        labels = split_header(head_lines if len(head_lines) else self.preamble)
+        selection = [None, 0]
+
+        def on_columns(columns, ncols):
+            selection[:] = [columns, ncols]
+
+        if len(body_lines):
+            (data, sx, sy) = getdata_lines(body_lines, *args, comments=self.comments, get_labels=lambda: labels,
+                                           on_columns=on_columns, **kwargs)
+        else:
+            (data, sx, sy) = (zeros((0, 0)), 0, 0)
+        return {'data': data, 'labels': select_labels(labels, *selection), 'size_x': sx, 'size_y': sy, 'body': [],
+                'header': head_lines, 'columns': selection[0], 'frame': self.markers[i]}
+
+
 # Extract space separatated value array from file
-def getdata_lines(old_lines, *args, **kwargs):
+def getdata_lines(old_lines, *args, engine='numpy', **kwargs):
+    """
+    Extracts an array of numbers from lines of space separated values
+    engine='numpy' (default) parses blocks of lines in bulk, engine='python' parses value by value
+    Both engines skip comments, and zero-fill rows shorter than the first row
+    With ragged=True, rows can be longer than the first row : the number of columns is set by the longest row,
+        and values missing from shorter rows are fill_value (nan by default)
+    With usecols, only some columns are kept (cf iter_row_blocks)
+    returns array, number of rows, number of columns
+    """
+    if engine == 'python':
+        return getdata_lines_python(old_lines, *args, **kwargs)
+    elif engine == 'numpy':
+        return getdata_lines_bulk(old_lines, *args, **kwargs)
+    else:
+        raise ValueError('Unknown parsing engine %s (should be numpy or python)' % engine)
+
+
+def getdata_lines_python(old_lines, *args, usecols=None, get_labels=None, on_columns=None, ragged=False,
+                         fill_value=math.nan, **kwargs):
     lines = copy.copy(old_lines)
     lines = clean_lines(remove_comments(lines, *args, **kwargs), *args, **kwargs)
     # print lines
@@ -594,21 +2165,247 @@ def getdata_lines(old_lines, *args, **kwargs):
     i = 0
     # while ~len(nums(lines[i])) and i<(nl-1):
     #	i=i+1
-    nc = len(nums(lines[i]))
-    ar = zeros((nl, nc))
-    n = 0;
-    for i, line in enumerate(lines):
-        # print line
-        nu = nums(line)
-        l = len(nu)
-        if l:
-            ar[n, 0:l] = nu
-            n = n + 1
-    return ar[0:n, :], n, nc
+    if ragged:
+        rows = [nu for nu in (nums(line) for line in lines) if len(nu)]
+        nc = max(len(nu) for nu in rows)
+        ar = full((len(rows), nc), fill_value, dtype=float)
+        for n, nu in enumerate(rows):
+            ar[n, 0:len(nu)] = nu
+        n = len(rows)
+        nl = n
+    else:
+        nc = len(nums(lines[i]))
+        ar = zeros((nl, nc))
+        n = 0;
+        for i, line in enumerate(lines):
+            # print line
+            nu = nums(line)
+            l = len(nu)
+            if l:
+                ar[n, 0:l] = nu
+                n = n + 1
+    if usecols is not None:
+        columns = resolve_usecols(usecols, get_labels() if get_labels is not None else [], nc)
+        if on_columns is not None:
+            on_columns(columns, nc)
+        if columns is not None:
+            return ascontiguousarray(ar[0:n, columns]), n, len(columns)
+    if n < nl:
+        # a copy, so that the rows without numbers are not kept in memory
+        return ar[0:n, :].copy(), n, nc
+    return ar, n, nc
+
+
+def getdata_lines_bulk(lines, *args, block_rows=__BLOCK_ROWS__, ragged=False, **kwargs):
+    """
+    Extracts an array of numbers from lines, converting blocks of lines at once with numpy
+    The number of columns is set by the first non-empty row, shorter rows are zero-filled
+    With ragged=True, the number of columns is set by the longest row instead (cf ragged_rows)
+    """
+    line_blocks = (lines[start:start + block_rows] for start in range(0, len(lines), block_rows))
+    if ragged:
+        ar = ragged_rows(line_blocks, *args, **kwargs)
+        if ar is None:
+            raise ValueError('No numeric data found in lines')
+        return ar, ar.shape[0], ar.shape[1]
+    blocks = list(iter_row_blocks(line_blocks, *args, **kwargs))
+    if not len(blocks):
+        raise ValueError('No numeric data found in lines')
+    ar = concatenate(blocks) if len(blocks) > 1 else blocks[0]
+    return ar, ar.shape[0], ar.shape[1]
+
+
+def ragged_rows(line_blocks, *args, comments=__COMMENTS__, usecols=None, get_labels=None, on_columns=None,
+                fill_value=math.nan, **kwargs):
+    """
+    Parses blocks of lines into a single array with as many columns as the longest row, or None if there are no numbers
+    Values missing from shorter rows are set to fill_value (nan by default)
+    All blocks are parsed first, to know the size of the array, then copied into it : there is no oversized buffer
+    With usecols, only some columns are kept (cf iter_row_blocks)
+    """
+    parsed = []
+    n = 0
+    nc = 0
+    for lines in line_blocks:
+        values, counts = parse_numeric_block(lines, comments=comments)
+        if len(counts):
+            parsed.append((values, counts))
+            n += len(counts)
+            nc = max(nc, int(counts.max()))
+    if not n:
+        return None
+    columns = None
+    if usecols is not None:
+        columns = resolve_usecols(usecols, get_labels() if get_labels is not None else [], nc)
+        if on_columns is not None:
+            on_columns(columns, nc)
+    ar = full((n, nc if columns is None else len(columns)), fill_value, dtype=float)
+    start = 0
+    for i in range(len(parsed)):
+        values, counts = parsed[i]
+        # the parsed values are released as soon as they are copied
+        parsed[i] = None
+        rows = rows_from_counts(values, counts, nc, fill_value=fill_value)
+        ar[start:start + len(counts)] = rows if columns is None else rows[:, columns]
+        start += len(counts)
+    return ar
+
+
+def iter_row_blocks(line_blocks, *args, comments=__COMMENTS__, usecols=None, get_labels=None, on_columns=None,
+                    **kwargs):
+    """
+    Parses blocks of lines into arrays of rows, yielding an array for each block containing numbers
+    The number of columns is set by the first row, shorter rows are zero-filled
+    With usecols, only some columns are kept (cf resolve_usecols), column labels being given by get_labels(),
+        called once the first row is read
+        Once the first row is read, on_columns(columns, ncols) (if provided) is told the indices of the kept columns
+        (None if all columns are kept) and the number of columns in the lines
+    """
+    nc = -1
+    columns = None
+    for lines in line_blocks:
+        if nc < 0:
+            nc = first_row_length(lines, comments=comments)
+            if nc < 0:
+                continue
+            if usecols is not None:
+                columns = resolve_usecols(usecols, get_labels() if get_labels is not None else [], nc)
+                if on_columns is not None:
+                    on_columns(columns, nc)
+        rows = parse_rows(lines, nc, comments=comments, usecols=columns)
+        if len(rows):
+            yield rows
+
+
+def first_row_length(lines, *args, comments=__COMMENTS__, **kwargs):
+    """ Number of values in the first line containing numbers, -1 if there is none """
+    for line in lines:
+        values, counts = parse_numeric_block([line], comments=comments)
+        if len(counts):
+            return int(counts[0])
+    return -1
+
+
+def parse_rows(lines, nc, *args, comments=__COMMENTS__, usecols=None, **kwargs):
+    """
+    Parses a block of lines into an array of nc columns, shorter rows being zero-filled
+    With usecols (a list of column indices), only these columns are converted and kept :
+        words that are not numbers are then only an issue in the kept columns
+    """
+    if usecols is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            try:
+                return ascontiguousarray(loadtxt(lines, comments=comments, ndmin=2, usecols=usecols))
+            except ValueError:
+                pass
+    values, counts = parse_numeric_block(lines, comments=comments)
+    rows = rows_from_counts(values, counts, nc)
+    return rows if usecols is None else ascontiguousarray(rows[:, usecols])
 
 
-def getdata(fname, *args, **kwargs):
+def resolve_usecols(usecols, labels=[], ncols=None):
+    """
+    Indices of the columns to keep, from usecols : a list of column indices and/or labels,
+        or a function of the list of labels returning such a list
+    Unknown labels and indices out of range are ignored, but a ValueError is raised if labels are given
+        and none of them is found
+    returns a sorted list of indices, or None if all columns are kept
+    """
+    if callable(usecols):
+        usecols = usecols(labels)
+    if usecols is None:
+        return None
+    if isinstance(usecols, str) or not hasattr(usecols, '__iter__'):
+        usecols = [usecols]
+    columns = set()
+    missing = []
+    for col in usecols:
+        if isinstance(col, str):
+            if col in labels:
+                columns.add(labels.index(col))
+            else:
+                missing.append(col)
+        else:
+            columns.add(int(col))
+    if len(missing) and len(missing) == len([col for col in usecols if isinstance(col, str)]):
+        raise ValueError('Columns %s not found in labels %s' % (', '.join(missing), labels))
+    columns = sorted(c for c in columns if c >= 0 and (ncols is None or c < ncols))
+    if not len(columns) or len(columns) == ncols:
+        return None
+    return columns
+
+
+def select_labels(labels, columns, ncols):
+    """ Labels of the kept columns ; labels that do not match the number of columns ncols are kept as they are """
+    if columns is None or len(labels) > ncols:
+        return labels
+    return [labels[c] for c in columns if c < len(labels)]
+
+
+def parse_numeric_block(lines, *args, comments=__COMMENTS__, **kwargs):
+    """
+    Parses a block of lines into a flat array of values and the number of values for each non-empty line
+    Rectangular numeric blocks are read by numpy's loadtxt,
+        other blocks fall back to a split of each line, and then to a value by value conversion
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            block = loadtxt(lines, comments=comments, ndmin=2)
+            if not block.size:
+                return block.ravel(), zeros(0, dtype=int)
+            return block.ravel(), full(block.shape[0], block.shape[1])
+        except ValueError:
+            pass
+
+    counts = []
+    words = []
+    for line in lines:
+        line_words = line_remove_comments(line, comments=comments).split()
+        if len(line_words):
+            counts.append(len(line_words))
+            words.extend(line_words)
     try:
+        return array(words, dtype=float), array(counts, dtype=int)
+    except ValueError:
+        pass
+
+    # Some words are not numbers : they are skipped, as in nums()
+    counts = []
+    values = []
+    for line in lines:
+        nu = nums(line_remove_comments(line, comments=comments))
+        if len(nu):
+            counts.append(len(nu))
+            values.extend(nu)
+    return array(values, dtype=float), array(counts, dtype=int)
+
+
+def rows_from_counts(values, counts, nc, fill_value=0.):
+    """
+    Makes a (rows x nc) array from a flat array of values and the number of values in each row
+    Values missing from shorter rows are set to fill_value
+    """
+    counts = asarray(counts)
+    if (counts == nc).all():
+        return values.reshape((len(counts), nc))
+    if (counts > nc).any():
+        raise ValueError('Row of %s values longer than the first row (%s values), use ragged=True to read it'
+                         % (counts.max(), nc))
+    ar = full((len(counts), nc), fill_value, dtype=float)
+    ar[arange(nc)[newaxis, :] < counts[:, newaxis]] = values
+    return ar
+
+
+def getdata(fname, *args, workers=None, **kwargs):
+    """
+    Reads the array of numbers of a file, returns array, number of rows, number of columns
+    With workers > 1, a large file is parsed in parallel by workers processes (cf scan_text_file_parallel)
+    """
+    try:
+        if workers is not None and workers > 1:
+            return scan_text_file_parallel(fname, workers=workers, inline_comments=True, **kwargs)[:3]
         lines = getlines(fname)
         return getdata_lines(lines, **kwargs)
     except:
@@ -617,19 +2414,38 @@ def getdata(fname, *args, **kwargs):
 
 
 # Extract space separatated value array from file
-def readnumsinlines(fname, *args, **kwargs):
-    lines = clean_lines(remove_comments(getlines(fname), *args, **kwargs), *args, **kwargs)
-    br = []
-    for line in lines:
-        nus = nums(line)
-        if len(nus):
-            br = append(br, nus[0])
+def readnumsinlines(fname, *args, engine='numpy', block_rows=__BLOCK_ROWS__, **kwargs):
+    """ Reads the first number of each line of a file """
+    if engine == 'python':
+        lines = clean_lines(remove_comments(getlines(fname), *args, **kwargs), *args, **kwargs)
+        br = []
+        for line in lines:
+            nus = nums(line)
+            if len(nus):
+                br = append(br, nus[0])
+        return br, len(br)
+
+    lines = getlines(fname)
+    firsts = []
+    for start in range(0, len(lines), block_rows):
+        values, counts = parse_numeric_block(lines[start:start + block_rows], *args, **kwargs)
+        if len(counts):
+            firsts.append(values[concatenate(([0], cumsum(counts)[:-1]))])
+    br = concatenate(firsts) if len(firsts) else array([])
     return br, len(br)
 
 
 # Saves data from array
-# todo : use **kwargs !
-def savedata(*args, fname="default.txt", header="#", **kwargs):
+def savedata(*args, fname="default.txt", header="#", fmt=None, mode='w', binary=False, block_rows=__BLOCK_ROWS__,
+             **kwargs):
+    """
+    Saves an array to a text file of space separated values, writing blocks of block_rows rows at a time
+    fmt : format of a value, e.g. '%.6g' ; by default values are written as str(value)
+    mode : 'w' to overwrite, 'a' to append to an existing file (the header is then only written for a new file)
+    binary : if True, saves to the .npy format instead, in fname as it is (no .npy is added) ; the array can also be
+        appended to an existing .npy file
+    If fname ends with .gz, .bz2 or .xz, the file is compressed (appending adds a compressed stream to the file)
+    """
     nargs = len(args)
     if nargs == 0:
         return
@@ -641,22 +2457,82 @@ def savedata(*args, fname="default.txt", header="#", **kwargs):
         if nargs == 3:
             header = args[2]
 
-    fi = open(fname, 'w')
-    fi.write("%s \n" % (clean_line(header)))
-    sha = shape(data)
-    if len(sha) > 1:
-        if sha[0] > 0 and sha[1] > 0:
-            fi.write("".join("".join((str(x) + " " for x in b)) + "\n" for b in data))
-    elif len(data) > 0:
-        fi.write("".join(str(b) + "\n" for b in data))
-    fi.close()
+    if mode not in ['w', 'a']:
+        raise ValueError('Unknown mode %s (should be w or a)' % mode)
+    data = asarray(data)
+
+    if binary:
+        if mode == 'a' and os.path.isfile(fname) and os.path.getsize(fname) > 0:
+            if file_compression(fname) is not None:
+                raise ValueError('Cannot append to compressed .npy file %s' % fname)
+            append_npy(fname, data)
+        else:
+            # through a file handle, numpy does not add .npy to the name
+            with open_file(fname, 'wb') as fi:
+                save(fi, data)
+        return
+
+    is_new = mode == 'w' or not os.path.isfile(fname) or os.path.getsize(fname) == 0
+    with open_file(fname, mode, buffering=2 ** 20) as fi:
+        if is_new and header is not None:
+            fi.write("%s \n" % (clean_line_return(header)))
+        write_array_text(fi, data, fmt=fmt, block_rows=block_rows)
     return
 
 
-# save lines to file name
+def write_array_text(fi, data, fmt=None, block_rows=__BLOCK_ROWS__):
+    """ Writes an array as lines of space separated values to an open file, by blocks of rows """
+    values = lambda block: block.ravel().tolist()
+    if fmt is None:
+        # values are written as str(value) ; a python float is the same number only for float64 values
+        fmt = '%s'
+        if data.dtype.kind in 'fc' and data.dtype not in (dtype(float), dtype(complex)):
+            values = lambda block: [str(x) for x in block.ravel()]
+    sha = data.shape
+    if len(sha) > 1:
+        if not (sha[0] > 0 and sha[1] > 0):
+            return
+        row = (fmt + ' ') * sha[1] + '\n'
+    elif len(sha) == 1 and sha[0] > 0:
+        row = fmt + '\n'
+    else:
+        return
+    for start in range(0, sha[0], block_rows):
+        block = data[start:start + block_rows]
+        fi.write((row * len(block)) % tuple(values(block)))
+
+
+def append_npy(fname, data):
+    """ Appends rows to an array saved in a .npy file, updating the shape in its header """
+    with open(fname, 'r+b') as f:
+        version = npy_format.read_magic(f)
+        if version == (1, 0):
+            shape_old, fortran_order, dtype_old = npy_format.read_array_header_1_0(f)
+        else:
+            shape_old, fortran_order, dtype_old = npy_format.read_array_header_2_0(f)
+        data_start = f.tell()
+        if fortran_order or dtype_old != data.dtype or tuple(shape_old[1:]) != tuple(data.shape[1:]):
+            raise ValueError('Cannot append array of shape %s and type %s to %s (shape %s, type %s)'
+                             % (data.shape, data.dtype, fname, shape_old, dtype_old))
+        header = {'descr': npy_format.dtype_to_descr(dtype_old), 'fortran_order': False,
+                  'shape': (shape_old[0] + data.shape[0],) + tuple(shape_old[1:])}
+        # numpy leaves room in the header for the first dimension to grow : the new header is checked before writing
+        new_header = io.BytesIO()
+        if version == (1, 0):
+            npy_format.write_array_header_1_0(new_header, header)
+        else:
+            npy_format.write_array_header_2_0(new_header, header)
+        if new_header.tell() != data_start:
+            raise ValueError('Could not update the header of %s' % fname)
+        f.seek(0, 2)
+        f.write(ascontiguousarray(data).tobytes())
+        f.seek(0)
+        f.write(new_header.getvalue())
+
+
+# save lines to file name ; compressed if fname ends with .gz, .bz2 or .xz
 def savelines(lines, fname):
-    f = open(fname, "w")
-    for line in lines:
-        f.write(line)
-    f.close()
+    with open_file(fname, "w") as f:
+        for line in lines:
+            f.write(line)
     return
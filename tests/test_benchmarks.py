@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sio_tools import benchmarks
+
+
+@pytest.mark.parametrize('module', list(benchmarks.__IMPORT_BUDGETS__.keys()))
+def test_import_does_not_load_slow_modules(module):
+    if module == 'ply_convert':
+        pytest.importorskip('plyfile')
+    budget, slow_modules = benchmarks.__IMPORT_BUDGETS__[module]
+    elapsed, loaded = benchmarks.measure_import(module, slow_modules=slow_modules, repeat=1)
+    assert loaded == []
+
+
+@pytest.mark.skipif(not os.environ.get('SIO_TOOLS_IMPORT_BUDGETS'),
+                    reason='import times depend on the machine load : set SIO_TOOLS_IMPORT_BUDGETS=1 to check them')
+@pytest.mark.parametrize('module', list(benchmarks.__IMPORT_BUDGETS__.keys()))
+def test_import_time_budget(module):
+    if module == 'ply_convert':
+        pytest.importorskip('plyfile')
+    timings, failures = benchmarks.bench_import_time(module, repeat=3)
+    assert failures == []
+
+
+def test_failed_import_is_over_budget():
+    timings, failures = benchmarks.bench_import_time('sio_tools_no_such_module', repeat=1)
+    assert timings == {}
+    assert len(failures) == 1
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from seplot.grapher import Graph
+
+
+def test_graph_labels_from_last_header_line(tmp_path):
+    # the later header line comes after the first block of rows read by sio_tools
+    lines = ['# x y z']
+    lines.extend('%s %s %s' % (i, i + 1, i + 2) for i in range(70000))
+    lines.append('# a b c')
+    lines.extend('%s %s %s' % (i, i + 1, i + 2) for i in range(10))
+    fname = str(tmp_path / 'labels.txt')
+    with open(fname, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    graph = Graph(fname=fname, x='a', y='c')
+    assert len(graph.X) == 70010
+    assert np.array_equal(graph.Y[:3], [2., 3., 4.])
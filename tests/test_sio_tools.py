@@ -0,0 +1,161 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sio_tools import sio_tools as sio
+
+
+def write_lines(path, lines):
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def test_parallel_getdata_keeps_inline_comments(tmp_path):
+    lines = ['% a b c']
+    for i in range(3000):
+        lines.append('%s %s %s' % (i, 2 * i, 3 * i) + (' % note' if i % 3 == 0 else ''))
+        if i % 500 == 0:
+            lines.extend(['# comment', ''])
+    fname = write_lines(tmp_path / 'inline.txt', lines)
+    serial = sio.getdata(fname)
+    parallel = sio.getdata(fname, workers=4, range_bytes=4096)
+    assert serial[1:] == parallel[1:] == (3000, 3)
+    assert np.array_equal(serial[0], parallel[0])
+
+
+def test_parallel_labels_match_serial(tmp_path):
+    lines = ['# x y z']
+    lines.extend('%s %s %s' % (i, i + 1, i + 2) for i in range(50))
+    lines.append('# a b c')
+    lines.extend('%s %s %s' % (i, i + 1, i + 2) for i in range(3000))
+    fname = write_lines(tmp_path / 'labels.txt', lines)
+    for block_rows in (20, 100, 10000):
+        serial = sio.txt_import_wrapper(fname, keep_lines=False, usecols=['c'], block_rows=block_rows)
+        parallel = sio.txt_import_wrapper(fname, keep_lines=False, usecols=['c'], block_rows=block_rows, workers=4,
+                                          range_bytes=4096)
+        assert serial['columns'] == parallel['columns'] == [2]
+        assert serial['labels'] == parallel['labels']
+        assert np.array_equal(serial['data'], parallel['data'])
+
+
+def test_labels_from_last_header_line(tmp_path):
+    lines = ['# x y z']
+    lines.extend('%s %s %s' % (i, i + 1, i + 2) for i in range(100))
+    lines.append('# a b c')
+    lines.extend('%s %s %s' % (i, i + 1, i + 2) for i in range(10))
+    fname = write_lines(tmp_path / 'labels.txt', lines)
+    full = sio.txt_import_wrapper(fname, usecols=['c'])
+    assert full['columns'] == [2]
+    assert full['labels'] == ['c']
+    for block_rows in (20, 50, 1000):
+        out = sio.txt_import_wrapper(fname, keep_lines=False, usecols=['c'], block_rows=block_rows)
+        assert out['columns'] == full['columns']
+        assert out['labels'] == full['labels']
+        assert np.array_equal(out['data'], full['data'])
+
+
+def test_savedata_round_trip_float32_and_str(tmp_path):
+    floats = (np.arange(12, dtype=np.float32).reshape((4, 3)) + np.float32(0.1))
+    fname = str(tmp_path / 'floats.txt')
+    sio.savedata(floats, fname=fname)
+    with open(fname) as f:
+        assert f.readlines()[1] == ' '.join(str(x) for x in floats[0]) + ' \n'
+    assert np.array_equal(np.loadtxt(fname, dtype=np.float32), floats)
+
+    words = np.array([['a', 'bc'], ['d', 'ef']])
+    fname = str(tmp_path / 'words.txt')
+    sio.savedata(words, fname=fname, header=None)
+    assert np.array_equal(np.loadtxt(fname, dtype=str), words)
+
+
+def make_tree(top):
+    for name in ('run_3.txt', 'run_1.txt', 'run_1.dat', 'other.txt'):
+        (top / name).write_text('1 2\n')
+    for sub in ('run_2.txt', 'b', 'a'):
+        (top / sub).mkdir()
+        (top / sub / 'run_5.txt').write_text('1 2\n')
+        (top / sub / 'c').mkdir()
+        (top / sub / 'c' / 'deep.txt').write_text('1 2\n')
+
+
+def test_file_index_matches_listing(tmp_path):
+    top = tmp_path / 'data'
+    top.mkdir()
+    make_tree(top)
+    folder = str(top)
+    index_dir = str(tmp_path / 'index')
+    for index in (False, True):
+        assert sio.make_file_list('run_', '.txt', folder=folder, index=index, index_dir=index_dir) == \
+            sio.make_run_list(os.listdir(folder), 'run_', '.txt')
+    assert sio.make_ordered_file_list('run_', '.txt', folder=folder, index=True, index_dir=index_dir) == \
+        sio.make_ordered_file_list('run_', '.txt', folder=folder)
+    # the run list only indexes the top folder
+    assert list(sio.FileIndex(folder, index_dir=index_dir, refresh=False).dirs.keys()) == ['']
+    for max_depth in (None, 0, 1):
+        assert sio.make_recursive_file_list(folder=folder, ext='.txt', max_depth=max_depth, index=True,
+                                            index_dir=index_dir) == \
+            sio.make_recursive_file_list(folder=folder, ext='.txt', max_depth=max_depth)
+
+
+def test_resolve_usecols_unknown_labels():
+    assert sio.resolve_usecols(['b', 'z'], ['a', 'b', 'c'], 3) == [1]
+    assert sio.resolve_usecols([0, 5], ['a', 'b', 'c'], 3) == [0]
+    with pytest.raises(ValueError):
+        sio.resolve_usecols(['z'], ['a', 'b', 'c'], 3)
+    with pytest.raises(ValueError):
+        sio.resolve_usecols([0, 'z'], ['a', 'b', 'c'], 3)
+
+
+def test_import_compressed_npz(tmp_path):
+    import gzip
+    data = np.arange(6.).reshape((3, 2))
+    fname = str(tmp_path / 'run.npz')
+    np.savez(fname, data=data, labels=np.array(['a', 'b']))
+    with open(fname, 'rb') as f, gzip.open(fname + '.gz', 'wb') as g:
+        g.write(f.read())
+    for name in (fname, fname + '.gz'):
+        out = sio.data_import_wrapper(name)
+        assert np.array_equal(out['data'], data)
+        assert out['labels'] == ['a', 'b']
+
+
+def test_cached_import_matches_uncached(tmp_path):
+    lines = ['# a b c']
+    lines.extend('%s %s %s' % (i, i + 1, i + 2) for i in range(20))
+    fname = write_lines(tmp_path / 'run.txt', lines)
+    cache_dir = str(tmp_path / 'cache')
+    for usecols in (['b'], lambda labels: [labels.index('c')]):
+        outs = [sio.data_import_wrapper(fname, cache=True, cache_dir=cache_dir, usecols=usecols) for i in range(2)]
+        for key in ('labels', 'size_x', 'size_y', 'columns'):
+            assert outs[0][key] == outs[1][key]
+        assert np.array_equal(outs[0]['data'], outs[1]['data'])
+        if not callable(usecols):
+            assert outs[0]['body'] == outs[1]['body'] == []
+    # imports with a function as usecols are not cached
+    assert len([name for name in os.listdir(cache_dir) if name.endswith('.npy')]) == 1
+
+
+def test_file_index_relative_folder(tmp_path, monkeypatch):
+    top = tmp_path / 'data_rv'
+    top.mkdir()
+    make_tree(top)
+    monkeypatch.chdir(top)
+    index_dir = str(tmp_path / 'index')
+    for folder in ('.', 'a', './b/'):
+        for options in ({'ext': '.txt'}, {'exclude': 'rv'}, {'include': 'run', 'max_depth': 1}):
+            listed = sio.make_recursive_file_list(folder=folder, **options)
+            assert len(listed)
+            assert sio.make_recursive_file_list(folder=folder, index=True, index_dir=index_dir, **options) == listed
+
+
+def test_savedata_binary_append_keeps_name(tmp_path):
+    data = np.arange(6.).reshape((3, 2))
+    fname = str(tmp_path / 'out.bin')
+    sio.savedata(data, fname=fname, binary=True)
+    sio.savedata(data, fname=fname, binary=True, mode='a')
+    assert os.listdir(str(tmp_path)) == ['out.bin']
+    assert np.array_equal(np.load(fname), np.concatenate([data, data]))